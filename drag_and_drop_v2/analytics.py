@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Aggregation of the `edx.drag_and_drop_v2.item.dropped` events found in tracking logs.
+
+Reads newline-delimited JSON tracking logs as a stream and computes, for each problem (usage key):
+
+* a confusion matrix: how many times each item was dropped on each zone;
+* first-attempt correctness: for each item, how many learners dropped it and how many of them
+  dropped it on the correct zone at their first attempt;
+* the distribution of numerical input errors (submitted value minus expected value, in buckets),
+  for problems whose definition is provided. Without it, only the number of submitted and
+  correct values is known.
+
+Counts are kept in memory, and depend on the number of problems, items and zones. To find the
+first attempt of each learner on each item, learners' drops are spilled to temporary partition
+files, by learner, which are then processed one at a time: memory use for that step is bounded by
+the size of the largest partition, roughly the number of drops in the log divided by the number of
+partitions. Large log files are split into byte ranges that are aggregated by separate processes.
+
+    python -m drag_and_drop_v2.analytics tracking.log --problems problems.json > stats.json
+
+where problems.json, if given, maps usage keys to problem definitions (the block's `data` field).
+"""
+
+# Imports ###########################################################
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+
+from .problem import CompiledProblem
+
+
+# Globals ###########################################################
+
+DROPPED_EVENT_TYPE = 'edx.drag_and_drop_v2.item.dropped'
+
+# Number of partition files among which learners' drops are spread to find their first attempts.
+DEFAULT_PARTITIONS = 64
+
+
+# Functions #########################################################
+
+def iter_dropped_events(lines, offset=0):
+    """
+    Yield (position, event) for each item.dropped event found in the tracking log `lines`.
+    `position` orders events logged at the same time; it is the byte offset of the line in the
+    log when `offset` is the offset of the first line. Lines that are not valid JSON are skipped.
+    """
+    for line in lines:
+        position = offset
+        offset += len(line)
+        if DROPPED_EVENT_TYPE not in line:
+            continue  # Cheap check, to avoid parsing the JSON of other events
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if event.get('event_type') != DROPPED_EVENT_TYPE:
+            continue
+        if not isinstance(event.get('event'), dict):
+            try:
+                event['event'] = json.loads(event['event'])
+            except (KeyError, TypeError, ValueError):
+                continue
+        yield position, event
+
+
+def aggregate(lines, problems=None, bucket_width=1.0, partitions=DEFAULT_PARTITIONS):
+    """
+    Aggregate the item.dropped events in `lines`. Returns a DroppedEventsAggregate.
+    """
+    directory = tempfile.mkdtemp(prefix='dnd-analytics-')
+    try:
+        result = DroppedEventsAggregate(problems, bucket_width)
+        drops = DropPartitions(directory, 0, partitions)
+        try:
+            result.consume(iter_dropped_events(lines), drops)
+        finally:
+            drops.close()
+        for index in xrange(partitions):
+            result.merge(_count_partition((directory, index)))
+    finally:
+        shutil.rmtree(directory)
+    return result
+
+
+def aggregate_file(path, problems=None, bucket_width=1.0, processes=None, partitions=DEFAULT_PARTITIONS):
+    """
+    Aggregate the item.dropped events in the log file at `path`, splitting it into one byte range
+    per process. Returns a DroppedEventsAggregate.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    directory = tempfile.mkdtemp(prefix='dnd-analytics-')
+    range_tasks = [
+        (path, start, end, problems, bucket_width, directory, writer, partitions)
+        for writer, (start, end) in enumerate(_byte_ranges(path, processes))
+    ]
+    partition_tasks = [(directory, index) for index in xrange(partitions)]
+
+    result = DroppedEventsAggregate(problems, bucket_width)
+    try:
+        if len(range_tasks) <= 1:
+            for partial in map(_aggregate_range, range_tasks) + map(_count_partition, partition_tasks):
+                result.merge(partial)
+            return result
+
+        pool = multiprocessing.Pool(processes)
+        try:
+            for partial in pool.imap_unordered(_aggregate_range, range_tasks):
+                result.merge(partial)
+            # The partitions are only complete once all byte ranges have been read.
+            for partial in pool.imap_unordered(_count_partition, partition_tasks):
+                result.merge(partial)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        shutil.rmtree(directory)
+    return result
+
+
+def _byte_ranges(path, count):
+    """
+    Split the file at `path` into at most `count` byte ranges [start, end) of about the same size.
+    """
+    size = os.path.getsize(path)
+    chunk = max(1, int(math.ceil(size / float(count))))
+    return [(start, min(start + chunk, size)) for start in xrange(0, size, chunk)]
+
+
+def _aggregate_range(task):
+    """
+    Aggregate the events on the lines of a log file that start within the byte range [start, end),
+    spilling the drops to the partitions in `directory`.
+    """
+    path, start, end, problems, bucket_width, directory, writer, partitions = task
+    result = DroppedEventsAggregate(problems, bucket_width)
+    drops = DropPartitions(directory, writer, partitions)
+    try:
+        with open(path, 'rb') as log_file:
+            offset = start
+            if start > 0:
+                # The line that contains `start` belongs to the previous range, unless it starts there.
+                log_file.seek(start - 1)
+                offset = start - 1 + len(log_file.readline())
+            result.consume(iter_dropped_events(_read_lines(log_file, offset, end), offset), drops)
+    finally:
+        drops.close()
+    return result
+
+
+def _count_partition(task):
+    """
+    Count the first attempts of the learners whose drops were spilled to one partition.
+    """
+    directory, index = task
+    result = DroppedEventsAggregate()
+    result.count_first_attempts(_read_partition(directory, index))
+    return result
+
+
+def _empty_input_stats():
+    return {'submitted': 0, 'correct': 0, 'errors': {}}
+
+
+def _merge_input_stats(stats, other_stats):
+    stats['submitted'] += other_stats['submitted']
+    stats['correct'] += other_stats['correct']
+    for bucket, count in other_stats['errors'].iteritems():
+        stats['errors'][bucket] = stats['errors'].get(bucket, 0) + count
+
+
+def _partition_path(directory, writer, index):
+    return os.path.join(directory, '{}.{}.ndjson'.format(writer, index))
+
+
+def _read_partition(directory, index):
+    """
+    Yield the (usage_key, user, item_id, attempt) drops written to partition `index` by all writers.
+    """
+    suffix = '.{}.ndjson'.format(index)
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(suffix):
+            with open(os.path.join(directory, name), 'rb') as partition_file:
+                for line in partition_file:
+                    usage_key, user, item_id, attempt = json.loads(line)
+                    yield usage_key, user, item_id, tuple(attempt)
+
+
+def _read_lines(log_file, offset, end):
+    log_file.seek(offset)
+    while offset < end:
+        line = log_file.readline()
+        if not line:
+            break
+        offset += len(line)
+        yield line
+
+
+# Classes ###########################################################
+
+class DropPartitions(object):
+    """
+    Writes learners' drops to up to `count` partition files in `directory`. All the drops of a
+    learner on a problem go to the same partition. `writer` identifies the files of one of the
+    processes writing to the same directory.
+    """
+
+    def __init__(self, directory, writer, count):
+        self.directory = directory
+        self.writer = writer
+        self.count = count
+        self.files = {}
+
+    def add(self, usage_key, user, item_id, attempt):
+        """
+        Write one drop, where `attempt` is (time, position, is_correct_location).
+        """
+        index = (zlib.crc32(json.dumps([usage_key, user])) & 0xffffffff) % self.count
+        partition_file = self.files.get(index)
+        if partition_file is None:
+            partition_file = self.files[index] = open(_partition_path(self.directory, self.writer, index), 'wb')
+        partition_file.write(json.dumps([usage_key, user, item_id, list(attempt)]) + '\n')
+
+    def close(self):
+        """
+        Close the partition files.
+        """
+        for partition_file in self.files.itervalues():
+            partition_file.close()
+        self.files = {}
+
+
+class DroppedEventsAggregate(object):
+    """
+    Statistics computed from item.dropped events. Partial aggregates computed from different parts
+    of a log can be combined with `merge`.
+
+    `problems` optionally maps usage keys to problem definitions, which are needed to compute
+    numerical input errors. Errors are counted in buckets `bucket_width` wide, each identified by
+    its lower bound.
+    """
+
+    def __init__(self, problems=None, bucket_width=1.0):
+        self.problems = {
+            usage_key: CompiledProblem(data) for usage_key, data in (problems or {}).iteritems()
+        }
+        self.bucket_width = bucket_width
+        # {usage_key: {(item_id, location_id): count}}
+        self.confusion = {}
+        # {usage_key: {item_id: {'learners': count, 'correct': count}}}
+        self.first_attempts = {}
+        # {usage_key: {item_id: {'submitted': count, 'correct': count, 'errors': {bucket: count}}}}
+        self.inputs = {}
+
+    def consume(self, events, drops):
+        """
+        Add the (position, event) pairs yielded by `events` to the aggregate, writing the drops to
+        the DropPartitions `drops`, whose first attempts are counted by `count_first_attempts`.
+        """
+        for position, event in events:
+            drop = self.add(event, position)
+            if drop is not None:
+                drops.add(*drop)
+
+    def add(self, event, position=0):
+        """
+        Add one parsed item.dropped tracking log event to the counts of the aggregate.
+        Returns (usage_key, user, item_id, attempt) for a drop, for `count_first_attempts`.
+        """
+        context = event.get('context') or {}
+        usage_key = (context.get('module') or {}).get('usage_key')
+        user = context.get('user_id') or event.get('username')
+        data = event['event']
+        item_id = data.get('item_id')
+
+        if data.get('input') is not None:
+            self._add_input(usage_key, item_id, data)
+            return None
+
+        matrix = self.confusion.setdefault(usage_key, {})
+        location = (item_id, data.get('location_id') or data.get('location'))
+        matrix[location] = matrix.get(location, 0) + 1
+
+        return usage_key, user, item_id, (event.get('time') or '', position, bool(data.get('is_correct_location')))
+
+    def count_first_attempts(self, drops):
+        """
+        Count the first attempt of each learner on each item among the (usage_key, user, item_id,
+        attempt) `drops`, which must include all the drops of the learners they include.
+        """
+        first_drops = {}
+        for usage_key, user, item_id, attempt in drops:
+            key = (usage_key, user, item_id)
+            previous = first_drops.get(key)
+            if previous is None or attempt < previous:
+                first_drops[key] = attempt
+
+        for (usage_key, _user, item_id), attempt in first_drops.iteritems():
+            counts = self.first_attempts.setdefault(usage_key, {}).setdefault(item_id, {'learners': 0, 'correct': 0})
+            counts['learners'] += 1
+            counts['correct'] += int(attempt[-1])
+
+    def _add_input(self, usage_key, item_id, data):
+        stats = self.inputs.setdefault(usage_key, {}).setdefault(item_id, _empty_input_stats())
+        stats['submitted'] += 1
+        stats['correct'] += int(bool(data.get('is_correct')))
+
+        problem = self.problems.get(usage_key)
+        try:
+            expected = problem.get_item(item_id)['inputOptions']['value']
+            error = float(data['input']) - expected
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return
+        bucket = math.floor(error / self.bucket_width) * self.bucket_width
+        stats['errors'][bucket] = stats['errors'].get(bucket, 0) + 1
+
+    def merge(self, other):
+        """
+        Add the statistics of another DroppedEventsAggregate to this one.
+        """
+        for usage_key, other_matrix in other.confusion.iteritems():
+            matrix = self.confusion.setdefault(usage_key, {})
+            for location, count in other_matrix.iteritems():
+                matrix[location] = matrix.get(location, 0) + count
+
+        for usage_key, other_items in other.first_attempts.iteritems():
+            items = self.first_attempts.setdefault(usage_key, {})
+            for item_id, other_counts in other_items.iteritems():
+                counts = items.setdefault(item_id, {'learners': 0, 'correct': 0})
+                counts['learners'] += other_counts['learners']
+                counts['correct'] += other_counts['correct']
+
+        for usage_key, other_items in other.inputs.iteritems():
+            items = self.inputs.setdefault(usage_key, {})
+            for item_id, other_stats in other_items.iteritems():
+                _merge_input_stats(items.setdefault(item_id, _empty_input_stats()), other_stats)
+
+    def to_dict(self):
+        """
+        Returns the statistics of each problem, in a JSON-serializable form:
+
+            {usage_key: {
+                'confusion': {item_id: {location_id: count}},
+                'first_attempts': {item_id: {'learners': count, 'correct': count}},
+                'inputs': {item_id: {'submitted': count, 'correct': count, 'errors': {bucket: count}}},
+            }}
+        """
+        result = {}
+
+        def problem_stats(usage_key):
+            return result.setdefault(usage_key, {'confusion': {}, 'first_attempts': {}, 'inputs': {}})
+
+        for usage_key, matrix in self.confusion.iteritems():
+            confusion = problem_stats(usage_key)['confusion']
+            for (item_id, location_id), count in matrix.iteritems():
+                confusion.setdefault(item_id, {})[location_id] = count
+
+        for usage_key, items in self.first_attempts.iteritems():
+            first_attempts = problem_stats(usage_key)['first_attempts']
+            for item_id, counts in items.iteritems():
+                first_attempts[item_id] = dict(counts)
+
+        for usage_key, items in self.inputs.iteritems():
+            inputs = problem_stats(usage_key)['inputs']
+            for item_id, stats in items.iteritems():
+                inputs[item_id] = dict(stats, errors={
+                    repr(bucket): count for bucket, count in stats['errors'].iteritems()
+                })
+
+        return result
+
+
+# Main ##############################################################
+
+def main(argv=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Aggregate drag and drop item.dropped events from tracking logs.")
+    parser.add_argument('log', help="tracking log file, with one JSON event per line")
+    parser.add_argument('--problems', help="JSON file mapping usage keys to problem definitions")
+    parser.add_argument('--bucket-width', type=float, default=1.0, help="width of the input error buckets")
+    parser.add_argument('--processes', type=int, default=None, help="number of worker processes")
+    parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS,
+                        help="number of temporary files among which drops are spread to find first attempts")
+    args = parser.parse_args(argv)
+
+    problems = None
+    if args.problems:
+        with open(args.problems) as problems_file:
+            problems = json.load(problems_file)
+    result = aggregate_file(args.log, problems, args.bucket_width, args.processes, args.partitions)
+    json.dump(result.to_dict(), sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Concatenated, content-hashed bundles of the CSS and JavaScript files of the block's views.
+
+Each view loads one CSS and one JavaScript bundle instead of one file per resource. The name of
+each bundle contains a hash of its content, so that browsers and CDNs can cache it forever. A
+gzip-compressed copy of each bundle is written next to it, for web servers that serve
+pre-compressed files.
+
+The bundles are built when the package is built (setup.py build_py, so also when it is
+installed from source or packaged as a wheel), or by hand with:
+
+    python -m drag_and_drop_v2.bundles [--minify-command "terser --compress --mangle"]
+
+which writes them and a manifest to public/bundles/. Without a manifest (e.g. in a development
+checkout), the views load the individual files, so changes to them are picked up immediately.
+A manifest older than any of the files it bundles is ignored, with a warning, so that a stale
+build left in a checkout does not hide later changes to the files.
+"""
+
+# Imports ###########################################################
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shlex
+import subprocess
+import sys
+
+import pkg_resources
+
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+# Files included in the bundles of each view, in the order they must be loaded.
+BUNDLES = {
+    'student_view': {
+        'css': (
+            'public/css/drag_and_drop.css',
+        ),
+        'js': (
+            'public/js/vendor/virtual-dom-1.3.0.min.js',
+            'public/js/drag_and_drop.js',
+        ),
+    },
+    'studio_view': {
+        'css': (
+            'public/css/vendor/jquery-ui-1.10.4.custom.min.css',
+            'public/css/drag_and_drop_edit.css',
+        ),
+        'js': (
+            'public/js/vendor/jquery-ui-1.10.4.custom.min.js',
+            'public/js/vendor/handlebars-v1.1.2.js',
+            'public/js/drag_and_drop_edit.js',
+        ),
+    },
+}
+
+BUNDLE_DIR = 'public/bundles'
+MANIFEST_PATH = BUNDLE_DIR + '/manifest.json'
+
+# Minifiers tried, in order, when no minify command is given. JavaScript is only concatenated
+# if none of them is installed; the vendor files are already minified.
+DEFAULT_MINIFY_COMMANDS = (
+    'terser --compress --mangle',
+    'uglifyjs --compress --mangle',
+)
+
+# Manifest of the installed bundles, loaded once per process; holds None if there is none.
+_manifest = []
+
+
+# Functions #########################################################
+
+def get_resource_paths(view):
+    """
+    Returns (css_paths, js_paths): the paths, relative to the package, of the resources to add
+    to the fragment of `view` ("student_view" or "studio_view"). These are the bundles when they
+    have been built, otherwise the individual files.
+    """
+    manifest = get_manifest()
+    if manifest and view in manifest:
+        return (manifest[view]['css'],), (manifest[view]['js'],)
+    return BUNDLES[view]['css'], BUNDLES[view]['js']
+
+
+def get_manifest():
+    """
+    Returns the manifest of the built bundles, mapping each view to the paths of its CSS and
+    JavaScript bundles, or None if the bundles have not been built or are out of date.
+    """
+    if not _manifest:
+        manifest = None
+        if pkg_resources.resource_exists(__name__, MANIFEST_PATH):
+            stale_paths = _get_stale_paths()
+            if stale_paths:
+                log.warning(
+                    "Ignoring the asset bundles, which are older than %s; rebuild them with "
+                    "`python -m drag_and_drop_v2.bundles`.", ", ".join(stale_paths)
+                )
+            else:
+                manifest = json.loads(pkg_resources.resource_string(__name__, MANIFEST_PATH))
+        _manifest.append(manifest)
+    return _manifest[0]
+
+
+def build(package_dir=None, minify_command=None):
+    """
+    Builds the bundles of all views from the files in `package_dir` (by default, the directory of
+    this package) into its public/bundles/ directory, replacing previous builds, and returns the
+    manifest.
+    """
+    package_dir = package_dir or os.path.dirname(os.path.abspath(__file__))
+    output_dir = os.path.join(package_dir, BUNDLE_DIR)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    for name in os.listdir(output_dir):
+        os.remove(os.path.join(output_dir, name))
+
+    if minify_command is None:
+        minify_command = _find_minify_command()
+
+    manifest = {}
+    for view, files in sorted(BUNDLES.items()):
+        css = minify_css(u'\n'.join(
+            _rebase_css_urls(_read(package_dir, path), path) for path in files['css']
+        ))
+        # Each file is terminated, so that a file ending in an expression without a semicolon
+        # does not run into the next one.
+        js = u'\n;\n'.join(_read(package_dir, path) for path in files['js'])
+        if minify_command:
+            js = minify_js(js, minify_command)
+        manifest[view] = {
+            'css': _write_bundle(package_dir, view, 'css', css),
+            'js': _write_bundle(package_dir, view, 'js', js),
+        }
+
+    with open(os.path.join(package_dir, MANIFEST_PATH), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return manifest
+
+
+def minify_css(css):
+    """
+    Removes comments and insignificant whitespace from `css`, leaving strings untouched.
+    """
+    tokens = re.split(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|/\*.*?\*/)', css, flags=re.DOTALL)
+    result = []
+    for index, token in enumerate(tokens):
+        if index % 2:  # String or comment
+            if not token.startswith(u'/*'):
+                result.append(token)
+            continue
+        token = re.sub(r'\s+', u' ', token)
+        token = re.sub(r' ?([{};,>]) ?', r'\1', token)
+        token = token.replace(u';}', u'}')
+        result.append(token)
+    return u''.join(result).strip()
+
+
+def minify_js(js, command):
+    """
+    Minifies `js` with the external `command`, which reads the script on its standard input and
+    writes the result on its standard output.
+    """
+    process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    output, _ = process.communicate(js.encode('utf-8'))
+    if process.returncode != 0:
+        raise RuntimeError("Minify command {!r} failed with status {}".format(command, process.returncode))
+    return output.decode('utf-8')
+
+
+def _get_stale_paths():
+    """
+    Returns the paths of the bundled files modified after the manifest was written.
+    """
+    def get_mtime(path):
+        return os.path.getmtime(pkg_resources.resource_filename(__name__, path))
+
+    manifest_mtime = get_mtime(MANIFEST_PATH)
+    paths = sorted(set(path for files in BUNDLES.values() for paths in files.values() for path in paths))
+    return [path for path in paths if get_mtime(path) > manifest_mtime]
+
+
+def _find_minify_command():
+    for command in DEFAULT_MINIFY_COMMANDS:
+        executable = command.split()[0]
+        if any(os.access(os.path.join(path, executable), os.X_OK) for path in os.environ['PATH'].split(os.pathsep)):
+            return command
+    return None
+
+
+def _read(package_dir, path):
+    with open(os.path.join(package_dir, path), 'rb') as resource_file:
+        return resource_file.read().decode('utf-8')
+
+
+def _rebase_css_urls(css, path):
+    """
+    Rewrites the relative URLs in the stylesheet at `path` to be relative to the bundle directory.
+    """
+    prefix = os.path.relpath(os.path.dirname(path), BUNDLE_DIR).replace(os.sep, '/') + '/'
+
+    def rebase(match):
+        quote, url = match.group(1), match.group(2)
+        if re.match(r'^([a-z][a-z0-9+.-]*:|/|#)', url, re.IGNORECASE):
+            return match.group(0)
+        return u'url({0}{1}{0})'.format(quote, prefix + url)
+
+    return re.sub(r'url\(\s*(["\']?)([^"\')]+)\1\s*\)', rebase, css)
+
+
+def _write_bundle(package_dir, view, extension, content):
+    """
+    Writes a bundle and its gzip-compressed copy, and returns the bundle's path.
+    """
+    content = content.encode('utf-8')
+    digest = hashlib.sha1(content).hexdigest()[:12]
+    path = '{}/{}.{}.min.{}'.format(BUNDLE_DIR, view, digest, extension)
+    with open(os.path.join(package_dir, path), 'wb') as bundle_file:
+        bundle_file.write(content)
+    # A fixed modification time keeps the compressed file identical between builds.
+    with open(os.path.join(package_dir, path + '.gz'), 'wb') as raw_file:
+        with gzip.GzipFile(filename='', mode='wb', fileobj=raw_file, compresslevel=9, mtime=0) as gzip_file:
+            gzip_file.write(content)
+    return path
+
+
+# Main ##############################################################
+
+def main(argv=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Build the CSS and JavaScript bundles of the Drag and Drop v2 views.")
+    parser.add_argument('--minify-command', default=None,
+                        help="command minifying JavaScript from stdin to stdout (default: terser or uglifyjs, "
+                             "if installed)")
+    parser.add_argument('--no-minify', action='store_true', help="only concatenate JavaScript files")
+    args = parser.parse_args(argv)
+
+    manifest = build(minify_command='' if args.no_minify else args.minify_command)
+    for view, paths in sorted(manifest.items()):
+        for path in (paths['css'], paths['js']):
+            sys.stdout.write('{}: {}\n'.format(view, path))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,29 +4,67 @@
 # Imports ###########################################################
 
 import json
+import re
 import webob
 import copy
 import urllib
 
 from xblock.core import XBlock
 from xblock.exceptions import JsonHandlerError
-from xblock.fields import Scope, String, Dict, Float, Boolean
+from xblock.fields import Scope, String, Dict, Float, Boolean, Integer
 from xblock.fragment import Fragment
 from xblockutils.resources import ResourceLoader
 from xblockutils.settings import XBlockWithSettingsMixin, ThemableXBlockMixin
 
-from .utils import _  # pylint: disable=unused-import
+from .utils import _, LRUCache, StatsCounter  # pylint: disable=unused-import
+from .bundles import get_resource_paths
 from .default_data import DEFAULT_DATA
+from .images import get_course_asset, get_default_image_size, probe_image_size
+from .instrumentation import instrumented
+from .problem import (
+    compile_definition, css_float, fingerprint, get_compiled_problem, is_correct_input, progress_grade,
+    progress_is_finished, update_progress, InvalidProblemDefinition,
+)
+from .storage import decode_item_state, encode_item_state
 
 
 # Globals ###########################################################
 
 loader = ResourceLoader(__name__)
 
+# The student view configuration only depends on author content and settings, so it is
+# computed once per block and content version, and shared by all learners.
+_configuration_cache = LRUCache(max_size=1024)
+
+# Expanded static asset URLs, keyed by course. Entries expire so that changes to how the
+# runtime serves course assets are picked up eventually.
+_static_url_cache = LRUCache(max_size=4096, ttl=600)
+
+# Distance (in percent of the background image's size) by which a dropped item's center may lie
+# outside the zone it was dropped on, when drop positions are validated.
+DEFAULT_DROP_POSITION_TOLERANCE = 20
+
+# Largest number of attempts accepted by the 'do_attempts' handler in one request.
+MAX_BATCH_ATTEMPTS = 100
+
+# Counts of grade events published ('grade_published') and skipped because the learner's
+# grade had not changed ('grade_suppressed'), for monitoring.
+publish_stats = StatsCounter()
+
+
+# Functions #########################################################
+
+def _is_scalar(value):
+    """
+    Is `value` a string or a number, as submitted for an item's position or input value.
+    """
+    return isinstance(value, (basestring, int, long, float)) and not isinstance(value, bool)
+
 
 # Classes ###########################################################
 
 @XBlock.wants('settings')
+@XBlock.needs('i18n')  # For the texts of studio_view and the error messages of studio_submit
 class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
     """
     XBlock that implements a friendly Drag-and-Drop problem
@@ -103,6 +141,27 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
         default=False,
     )
 
+    progress = Dict(
+        help=_(
+            "Running counts of placed items, items awaiting numerical input and correct items, "
+            "kept in sync with the learner's item state."
+        ),
+        scope=Scope.user_state,
+        default={},
+    )
+
+    last_published_grade = Dict(
+        help=_("The last grade event published for the learner, used to avoid publishing an unchanged grade."),
+        scope=Scope.user_state,
+        default={},
+    )
+
+    state_version = Integer(
+        help=_("Incremented every time the learner's item state changes."),
+        scope=Scope.user_state,
+        default=0,
+    )
+
     block_settings_key = 'drag-and-drop-v2'
     has_score = True
 
@@ -110,24 +169,30 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
         """ Translate text """
         return self.runtime.service(self, "i18n").ugettext(text)
 
+    @instrumented('student_view')
     @XBlock.supports("multi_device")  # Enable this block for use in the mobile app via webview
     def student_view(self, context):
         """
         Player view, displayed to the student
         """
 
+        settings = self.get_xblock_settings(default={})
+        js_params = self.get_configuration()
+        # Buffer analytics events on the client and send them to 'publish_event' in batches:
+        js_params["batch_events"] = bool(settings.get('batch_events', False))
+        # Only initialize the block on the client once it is scrolled close to the viewport:
+        js_params["lazy_hydration"] = bool(settings.get('lazy_hydration', False))
+        # The learner's state is embedded so the block can be rendered without waiting for
+        # 'get_user_state'; the client only fetches it if the embedded copy is stale.
+        js_params["user_state"] = self._get_user_state()
+
+        context = {}
+        if js_params["lazy_hydration"]:
+            context["placeholder"] = self._get_placeholder_size(js_params)
+
         fragment = Fragment()
-        fragment.add_content(loader.render_template('/templates/html/drag_and_drop.html'))
-        css_urls = (
-            'public/css/vendor/jquery-ui-1.10.4.custom.min.css',
-            'public/css/drag_and_drop.css'
-        )
-        js_urls = (
-            'public/js/vendor/jquery-ui-1.10.4.custom.min.js',
-            'public/js/vendor/jquery-ui-touch-punch-0.2.3.min.js',  # Makes it work on touch devices
-            'public/js/vendor/virtual-dom-1.3.0.min.js',
-            'public/js/drag_and_drop.js',
-        )
+        fragment.add_content(loader.render_template('/templates/html/drag_and_drop.html', context))
+        css_urls, js_urls = get_resource_paths('student_view')
         for css_url in css_urls:
             fragment.add_css_url(self.runtime.local_resource_url(self, css_url))
         for js_url in js_urls:
@@ -135,19 +200,69 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
 
         self.include_theme_files(fragment)
 
-        fragment.initialize_js('DragAndDropBlock', self.get_configuration())
+        fragment.initialize_js('DragAndDropBlock', js_params)
 
         return fragment
 
+    @staticmethod
+    def _get_placeholder_size(configuration):
+        """
+        Get the size of the placeholder shown until a lazily hydrated block is initialized: the
+        width of the background image, in pixels, and its height as a percentage of its width,
+        both formatted for CSS. Both are None if the size of the image is unknown.
+        """
+        width, height = configuration['target_img_width'], configuration['target_img_height']
+        if not width or not height:
+            return {'width': None, 'height_percent': None}
+        return {'width': str(int(width)), 'height_percent': '{:.4f}'.format(100.0 * height / width)}
+
     def get_configuration(self):
         """
         Get the configuration data for the student_view.
         The configuration is all the settings defined by the author, except for correct answers
         and feedback.
+
+        The runtime-independent part of the result is cached per process; callers must not modify
+        the values it contains. URLs, which depend on the runtime, are expanded on each call.
+        """
+        problem = self._get_problem()
+        settings_key = fingerprint([
+            self.display_name, self.show_title, self.question_text, self.show_question_header,
+            self.item_background_color, self.item_text_color, getattr(self, 'url_name', ''),
+        ])
+        key = (unicode(self.scope_ids.usage_id), problem.fingerprint, settings_key)
+        configuration = _configuration_cache.get(key)
+        if configuration is None:
+            configuration = self._build_configuration(problem)
+            _configuration_cache.set(key, configuration)
+        configuration = dict(configuration)
+        configuration["target_img_expanded_url"] = self.target_img_expanded_url
+        return configuration
+
+    def _build_configuration(self, problem):
+        """
+        Build the cached configuration data for the student_view from the compiled problem.
+        It must not contain anything that depends on the runtime, such as asset URLs.
         """
 
+        def zones_with_geometry():
+            # Zones whose geometry has been converted to percentages at save time are sent without
+            # their pixel geometry, and with the HTML ID the client would otherwise compute.
+            zones = self._get_zones()
+            url_name = getattr(self, 'url_name', '')
+            for zone in zones:
+                if 'x_percent' in zone:
+                    for key in ('x', 'y', 'width', 'height'):
+                        zone.pop(key, None)
+                    zone['prefixed_uid'] = u'{}-{}'.format(url_name, re.sub(r'[^\w\-]', '_', zone['uid']))
+            return zones
+
+        image_size = problem.image_size
+        if image_size is None and not self.data.get('targetImg'):
+            image_size = get_default_image_size()
+
         def items_without_answers():
-            items = copy.deepcopy(self.data.get('items', ''))
+            items = copy.deepcopy(problem.items)
             for item in items:
                 del item['feedback']
                 del item['zone']
@@ -155,7 +270,7 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
             return items
 
         return {
-            "zones": self._get_zones(),
+            "zones": zones_with_geometry(),
             # SDK doesn't supply url_name.
             "url_name": getattr(self, 'url_name', ''),
             "display_zone_labels": self.data.get('displayLabels', False),
@@ -165,14 +280,17 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
             "show_title": self.show_title,
             "problem_text": self.question_text,
             "show_problem_header": self.show_question_header,
-            "target_img_expanded_url": self.target_img_expanded_url,
             "target_img_description": self.target_img_description,
+            # Intrinsic size of the background image, so that the client need not wait for it to load:
+            "target_img_width": image_size[0] if image_size else None,
+            "target_img_height": image_size[1] if image_size else None,
             "item_background_color": self.item_background_color or None,
             "item_text_color": self.item_text_color or None,
             "initial_feedback": self.data['feedback']['start'],
             # final feedback (data.feedback.finish) is not included - it may give away answers.
         }
 
+    @instrumented('studio_view')
     def studio_view(self, context):
         """
         Editing view in Studio
@@ -193,15 +311,7 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
         fragment = Fragment()
         fragment.add_content(loader.render_template('/templates/html/drag_and_drop_edit.html', context))
 
-        css_urls = (
-            'public/css/vendor/jquery-ui-1.10.4.custom.min.css',
-            'public/css/drag_and_drop_edit.css'
-        )
-        js_urls = (
-            'public/js/vendor/jquery-ui-1.10.4.custom.min.js',
-            'public/js/vendor/handlebars-v1.1.2.js',
-            'public/js/drag_and_drop_edit.js',
-        )
+        css_urls, js_urls = get_resource_paths('studio_view')
         for css_url in css_urls:
             fragment.add_css_url(self.runtime.local_resource_url(self, css_url))
         for js_url in js_urls:
@@ -215,8 +325,14 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
 
         return fragment
 
+    @instrumented('studio_submit')
     @XBlock.json_handler
     def studio_submit(self, submissions, suffix=''):
+        try:
+            data = compile_definition(self._with_image_size(submissions['data']))
+        except InvalidProblemDefinition as error:
+            return {'result': 'error', 'message': error.translate(self._)}
+
         self.display_name = submissions['display_name']
         self.show_title = submissions['show_title']
         self.question_text = submissions['problem_text']
@@ -224,29 +340,111 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
         self.weight = float(submissions['weight'])
         self.item_background_color = submissions['item_background_color']
         self.item_text_color = submissions['item_text_color']
-        self.data = submissions['data']
+        self.data = data
+
+        # The author may have just uploaded new versions of the images; expand their URLs again.
+        for url in self._get_image_urls():
+            _static_url_cache.delete(self._static_url_cache_key(url))
 
         return {
             'result': 'success',
         }
 
+    def _with_image_size(self, data):
+        """
+        Returns the submitted problem definition `data` with the size of its background image,
+        when it can be read on the server: that of a course asset, or of the default image.
+        Otherwise, the size measured by the editor (if any) is kept.
+        """
+        if not isinstance(data, dict):
+            return data
+        url = data.get('targetImg')
+        if url:
+            content = get_course_asset(getattr(self.runtime, 'course_id', None), url)
+            size = probe_image_size(content) if content else None
+        else:
+            size = get_default_image_size()
+        if size:
+            data = dict(data, targetImgWidth=size[0], targetImgHeight=size[1])
+        return data
+
+    @instrumented('do_attempt')
     @XBlock.json_handler
     def do_attempt(self, attempt, suffix=''):
-        item = self._get_item_definition(attempt['val'])
+        problem = self._get_problem()
+        item_state = self._get_item_state()
+        progress = self._get_progress(problem)
+
+        result, event = self._evaluate_attempt(problem, item_state, progress, attempt)
+        self._save_attempts(item_state, progress, [event])
+
+        result['state_version'] = self.state_version
+        return result
+
+    @instrumented('do_attempts')
+    @XBlock.json_handler
+    def do_attempts(self, attempts, suffix=''):
+        """
+        Evaluate an ordered list of at most MAX_BATCH_ATTEMPTS attempts (as accepted by
+        `do_attempt`) in one request. The learner state is saved and the grade published once,
+        after all attempts have been evaluated.
+        Returns the result of each attempt, in the same order. An invalid attempt does not affect
+        the others: its result is {'error': <message>}, where `do_attempt` would return a 400 error.
+        """
+        if not isinstance(attempts, list):
+            raise JsonHandlerError(400, "Expected a list of attempts.")
+        if len(attempts) > MAX_BATCH_ATTEMPTS:
+            raise JsonHandlerError(400, "Too many attempts.")
+
+        problem = self._get_problem()
+        item_state = self._get_item_state()
+        progress = self._get_progress(problem)
+
+        results, events = [], []
+        for attempt in attempts:
+            try:
+                result, event = self._evaluate_attempt(problem, item_state, progress, attempt)
+            except JsonHandlerError as error:
+                results.append({'error': error.message})
+            else:
+                results.append(result)
+                events.append(event)
+        if events:
+            self._save_attempts(item_state, progress, events)
+
+        return {'results': results, 'state_version': self.state_version}
+
+    def _evaluate_attempt(self, problem, item_state, progress, attempt):
+        """
+        Evaluate a single attempt against the learner's `item_state` and `progress`, which are
+        updated in place. Returns the result for the learner and the data of the
+        'item.dropped' event to publish.
+
+        Raises JsonHandlerError (leaving `item_state` and `progress` untouched) if the attempt is
+        invalid.
+        """
+        if not isinstance(attempt, dict):
+            raise JsonHandlerError(400, "Expected an attempt object.")
+        try:
+            item = problem.get_item(attempt.get('val'))
+        except (KeyError, TypeError):  # Unknown or unhashable item ID
+            raise JsonHandlerError(400, "Item not found.")
+
+        item_key = str(item['id'])
+        previous_state = item_state.get(item_key)
+        zone = self._get_attempt_zone(problem, attempt, previous_state)
 
         state = None
-        zone = None
         feedback = item['feedback']['incorrect']
-        overall_feedback = None
         is_correct = False
         is_correct_location = False
 
         if 'input' in attempt:  # Student submitted numerical value for item
-            state = self._get_item_state().get(str(item['id']))
+            state = copy.copy(previous_state)
             if state:
                 state['input'] = attempt['input']
                 is_correct_location = True
-                if self._is_correct_input(item, attempt['input']):
+                if is_correct_input(item, attempt['input']):
                     is_correct = True
                     feedback = item['feedback']['correct']
                 else:
@@ -269,50 +467,113 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
             }
 
         if state:
-            self.item_state[str(item['id'])] = state
-            zone = self._get_zone_by_uid(state['zone'])
+            update_progress(progress, problem.item_progress(item_key, previous_state), sign=-1)
+            update_progress(progress, problem.item_progress(item_key, state))
+            item_state[item_key] = state
+
+        is_finished = self._is_finished(progress)
+
+        return {
+            'correct': is_correct,
+            'correct_location': is_correct_location,
+            'finished': is_finished,
+            'overall_feedback': self.data['feedback']['finish'] if is_finished else None,
+            'feedback': feedback
+        }, {
+            'item_id': item['id'],
+            'location': zone.get("title"),
+            'location_id': zone.get("uid"),
+            'input': attempt.get('input'),
+            'is_correct_location': is_correct_location,
+            'is_correct': is_correct,
+        }
+
+    def _get_attempt_zone(self, problem, attempt, previous_state):
+        """
+        Check the values of an attempt, and return the zone it concerns: the zone the item was
+        dropped on, or for an input value, the zone the item was placed in.
+        Raises JsonHandlerError if the attempt is invalid.
+        """
+        if 'input' in attempt:
+            if not _is_scalar(attempt['input']):
+                raise JsonHandlerError(400, "Input value invalid.")
+            zone_uid = previous_state['zone'] if previous_state else attempt.get('zone')
         else:
-            zone = self._get_zone_by_uid(attempt['zone'])
+            if not (_is_scalar(attempt.get('x_percent')) and _is_scalar(attempt.get('y_percent'))):
+                raise JsonHandlerError(400, "Item position invalid.")
+            self._validate_drop_position(problem, attempt)
+            zone_uid = attempt.get('zone')
+        try:
+            zone = problem.get_zone(zone_uid)
+        except TypeError:  # Unhashable zone UID
+            zone = None
         if not zone:
             raise JsonHandlerError(400, "Item zone data invalid.")
+        return zone
 
-        if self._is_finished():
-            overall_feedback = self.data['feedback']['finish']
+    def _validate_drop_position(self, problem, attempt):
+        """
+        When 'validate_drop_position' is set in the XBlock settings, check that the position of a
+        dropped item falls in the zone it was dropped on (extended by 'drop_position_tolerance'
+        percent of the background image on each side, as the position is that of the item's
+        center rather than of the pointer). Zones whose geometry is not known are not checked.
+        """
+        settings = self.get_xblock_settings(default={})
+        if not settings.get('validate_drop_position', False):
+            return
+        tolerance = settings.get('drop_position_tolerance', DEFAULT_DROP_POSITION_TOLERANCE)
+        x_percent, y_percent = css_float(attempt.get('x_percent')), css_float(attempt.get('y_percent'))
+        if x_percent is None or y_percent is None:
+            raise JsonHandlerError(400, "Item position invalid.")
+        if problem.zone_grid.contains(attempt.get('zone'), x_percent, y_percent, tolerance) is False:
+            raise JsonHandlerError(400, "Item position is not in the zone.")
+
+    def _save_attempts(self, item_state, progress, events):
+        """
+        Store the learner state resulting from one or more evaluated attempts, publish the
+        grade (unless the learner has already completed the problem) and the 'item.dropped' events.
+        """
+        self.item_state = encode_item_state(item_state)
+        self.progress = progress
+        self.state_version += 1
 
         # don't publish the grade if the student has already completed the problem
         if not self.completed:
-            if self._is_finished():
+            if self._is_finished(progress):
                 self.completed = True
-            try:
-                self.runtime.publish(self, 'grade', {
-                    'value': self._get_grade(),
-                    'max_value': self.weight,
-                })
-            except NotImplementedError:
-                # Note, this publish method is unimplemented in Studio runtimes,
-                # so we have to figure that we're running in Studio for now
-                pass
+            self._publish_grade({
+                'value': self._get_grade(progress),
+                'max_value': self.weight,
+            })
 
-        self.runtime.publish(self, 'edx.drag_and_drop_v2.item.dropped', {
-            'item_id': item['id'],
-            'location': zone.get("title"),
-            'location_id': zone.get("uid"),
-            'input': attempt.get('input'),
-            'is_correct_location': is_correct_location,
-            'is_correct': is_correct,
-        })
+        for event in events:
+            self.runtime.publish(self, 'edx.drag_and_drop_v2.item.dropped', event)
 
-        return {
-            'correct': is_correct,
-            'correct_location': is_correct_location,
-            'finished': self._is_finished(),
-            'overall_feedback': overall_feedback,
-            'feedback': feedback
-        }
+    def _publish_grade(self, grade):
+        """
+        Publish the learner's grade, unless it is the same as the last grade published for them.
+        Setting 'always_publish_grade' in the XBlock settings disables that check.
+        """
+        always_publish = self.get_xblock_settings(default={}).get('always_publish_grade', False)
+        if grade == self.last_published_grade and not always_publish:
+            publish_stats.increment('grade_suppressed')
+            return
+        try:
+            self.runtime.publish(self, 'grade', grade)
+        except NotImplementedError:
+            # Note, this publish method is unimplemented in Studio runtimes,
+            # so we have to figure that we're running in Studio for now
+            pass
+        else:
+            publish_stats.increment('grade_published')
+            self.last_published_grade = grade
 
+    @instrumented('reset')
     @XBlock.json_handler
     def reset(self, data, suffix=''):
-        self.item_state = {}
+        self.item_state = encode_item_state({})
+        self.progress = self._get_problem().empty_progress()
+        self.state_version += 1
         return self._get_user_state()
 
     def _expand_static_url(self, url):
@@ -321,7 +582,22 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
         only portable URL format for static files that works across export/import and reruns).
         This method is unfortunately a bit hackish since XBlock does not provide a low-level API
         for this.
+        Expanded URLs are cached per course.
         """
+        key = self._static_url_cache_key(url)
+        expanded_url = _static_url_cache.get(key)
+        if expanded_url is None:
+            expanded_url = self._replace_static_url(url)
+            _static_url_cache.set(key, expanded_url)
+        return expanded_url
+
+    def _static_url_cache_key(self, url):
+        """ The key under which the expanded version of `url` is cached. """
+        # The LMS and Studio runtimes expand URLs differently (see below), so they don't share entries.
+        return (unicode(getattr(self.runtime, 'course_id', '')), hasattr(self.runtime, 'replace_urls'), url)
+
+    def _replace_static_url(self, url):
+        """ Expand `url` using the runtime. """
         if hasattr(self.runtime, 'replace_urls'):
             url = self.runtime.replace_urls('"{}"'.format(url))[1:-1]
         elif hasattr(self.runtime, 'course_id'):
@@ -339,6 +615,19 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
         """ AJAX-accessible handler for expanding URLs to static [image] files """
         return {'url': self._expand_static_url(url)}
 
+    @XBlock.json_handler
+    def expand_static_urls(self, urls, suffix=''):
+        """ AJAX-accessible handler for expanding a list of URLs to static [image] files in one request """
+        if not isinstance(urls, list):
+            raise JsonHandlerError(400, "Expected a list of URLs.")
+        return {'urls': [self._expand_static_url(url) for url in urls]}
+
+    def _get_image_urls(self):
+        """ The (unexpanded) URLs of the background image and of all item images. """
+        urls = [self.data.get("targetImg")]
+        urls.extend(item.get("imageURL") for item in self.data.get("items", []))
+        return [url for url in urls if url]
+
     @property
     def target_img_expanded_url(self):
         """ Get the expanded URL to the target image (the image items are dragged onto). """
@@ -357,18 +646,48 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
         """ The URL to the default background image, shown when no custom background is used """
         return self.runtime.local_resource_url(self, "public/img/triangle.png")
 
+    @instrumented('get_user_state')
     @XBlock.handler
     def get_user_state(self, request, suffix=''):
-        """ GET all user-specific data, and any applicable feedback """
-        data = self._get_user_state()
-        return webob.Response(body=json.dumps(data), content_type='application/json')
+        """
+        GET all user-specific data, and any applicable feedback.
+        Supports conditional requests: responds with 304 Not Modified if the state has not changed.
+        """
+        etag = self._get_user_state_etag()
+        # The state is private to the learner, and browsers must check that it is still fresh before using it:
+        cache_control = 'private, no-cache'
+        if etag in request.if_none_match:
+            response = webob.Response(status=304)
+        else:
+            data = self._get_user_state()
+            response = webob.Response(body=json.dumps(data), content_type='application/json')
+        response.etag = etag
+        response.cache_control = cache_control
+        return response
+
+    def _get_user_state_etag(self):
+        """
+        Returns an entity tag that changes whenever the output of `_get_user_state` may change:
+        when the learner's state changes, or when the problem definition is modified.
+        """
+        # Different learners may share a browser (and therefore its cache), so include the user ID.
+        # The state itself is hashed rather than identified by state_version alone, which starts
+        # over when an instructor resets the learner's state.
+        return fingerprint([
+            unicode(self.scope_ids.user_id),
+            self.item_state,
+            self.completed,
+            self.state_version,
+            self._get_problem().fingerprint,
+        ])
 
     def _get_user_state(self):
         """ Get all user-specific data, and any applicable feedback """
+        problem = self._get_problem()
         item_state = self._get_item_state()
         for item_id, item in item_state.iteritems():
-            definition = self._get_item_definition(int(item_id))
-            item['correct_input'] = self._is_correct_input(definition, item.get('input'))
+            definition = problem.get_item(int(item_id))
+            item['correct_input'] = is_correct_input(definition, item.get('input'))
             # If information about zone is missing
             # (because problem was completed before a11y enhancements were implemented),
             # deduce zone in which item is placed from definition:
@@ -380,100 +699,96 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
             'items': item_state,
             'finished': is_finished,
             'overall_feedback': self.data['feedback']['finish' if is_finished else 'start'],
+            'state_version': self.state_version,
         }
 
     def _get_item_state(self):
         """
-        Returns the user item state.
-        Converts to a dict if data is stored in legacy tuple form.
+        Returns a copy of the user item state, in dict form.
+        Converts from the compact or legacy formats in which it may be stored, and converts item
+        positions saved in pixels by old versions of the block to percentages when the size of
+        the background image is known. The converted state is stored on the next save.
         """
-        state = {}
+        item_state = decode_item_state(self.item_state)
+        self._get_problem().migrate_item_state(item_state)
+        return item_state
 
-        for item_id, item in self.item_state.iteritems():
-            if isinstance(item, dict):
-                state[item_id] = item
-            else:
-                state[item_id] = {'top': item[0], 'left': item[1]}
+    def _get_problem(self):
+        """
+        Returns the compiled, read-only index of the problem definition in `data`.
+        It is compiled once per distinct `data` content and shared between block instances.
 
-        return state
+        The problem is also kept on the instance for as long as `data` is the same object, so that
+        the content fingerprint is only computed once per request. `data` must be replaced, not
+        modified in place, for a change to be picked up.
+        """
+        data = self.data
+        cached = getattr(self, '_compiled_problem', None)
+        if cached is None or cached[0] is not data:
+            cached = self._compiled_problem = (data, get_compiled_problem(data))
+        return cached[1]
 
     def _get_item_definition(self, item_id):
         """
         Returns definition (settings) for item identified by `item_id`.
         """
-        return next(i for i in self.data['items'] if i['id'] == item_id)
+        return self._get_problem().get_item(item_id)
 
     def _get_zones(self):
         """
         Get drop zone data, defined by the author.
         """
-        # Convert zone data from old to new format if necessary
-        zones = []
-        for zone in self.data.get('zones', []):
-            zone = zone.copy()
-            if "uid" not in zone:
-                zone["uid"] = zone.get("title")  # Older versions used title as the zone UID
-            # Remove old, now-unused zone attributes, if present:
-            zone.pop("id", None)
-            zone.pop("index", None)
-            zones.append(zone)
-        return zones
+        return [zone.copy() for zone in self._get_problem().zones]
 
     def _get_zone_by_uid(self, uid):
         """
         Given a zone UID, return that zone, or None.
         """
-        for zone in self._get_zones():
-            if zone["uid"] == uid:
-                return zone
+        return self._get_problem().get_zone(uid)
 
-    def _get_grade(self):
+    def _get_progress(self, problem):
         """
-        Returns the student's grade for this block.
+        Returns a copy of the learner's progress counters for `problem`.
+        The counters are recomputed from the item state if they are missing or were computed
+        against a different version of the problem definition. Recomputed counters are only
+        stored by the handlers that save the learner's state, so that reading it never writes.
         """
-        correct_count = 0
-        total_count = 0
-        item_state = self._get_item_state()
+        progress = self.progress
+        if progress.get('problem') != problem.fingerprint:
+            return problem.compute_progress(self._get_item_state())
+        return dict(progress)
 
-        for item in self.data['items']:
-            if item['zone'] != 'none':
-                total_count += 1
-                item_id = str(item['id'])
-                if item_id in item_state:
-                    if self._is_correct_input(item, item_state[item_id].get('input')):
-                        correct_count += 1
-
-        return correct_count / float(total_count) * self.weight
+    def _get_grade(self, progress=None):
+        """
+        Returns the student's grade for this block.
+        """
+        if progress is None:
+            progress = self._get_progress(self._get_problem())
+        return progress_grade(progress, self.weight)
 
-    def _is_finished(self):
+    def _is_finished(self, progress=None):
         """
         All items are at their correct place and a value has been
         submitted for each item that expects a value.
         """
-        completed_count = 0
-        total_count = 0
-        item_state = self._get_item_state()
-        for item in self.data['items']:
-            if item['zone'] != 'none':
-                total_count += 1
-                item_id = str(item['id'])
-                if item_id in item_state:
-                    if 'inputOptions' in item:
-                        if 'input' in item_state[item_id]:
-                            completed_count += 1
-                    else:
-                        completed_count += 1
-
-        return completed_count == total_count
+        if progress is None:
+            progress = self._get_progress(self._get_problem())
+        return progress_is_finished(progress)
 
+    @instrumented('publish_event')
     @XBlock.json_handler
     def publish_event(self, data, suffix=''):
-        try:
-            event_type = data.pop('event_type')
-        except KeyError:
+        """
+        Publish an analytics event sent by the client, or a list of events (in order) if the
+        client batches them.
+        """
+        events = data if isinstance(data, list) else [data]
+        if not all(isinstance(event, dict) and 'event_type' in event for event in events):
             return {'result': 'error', 'message': 'Missing event_type in JSON data'}
 
-        self.runtime.publish(self, event_type, data)
+        for event in events:
+            event_type = event.pop('event_type')
+            self.runtime.publish(self, event_type, event)
         return {'result': 'success'}
 
     def _get_unique_id(self):
@@ -484,25 +799,6 @@ class DragAndDropBlock(XBlock, XBlockWithSettingsMixin, ThemableXBlockMixin):
             # workaround for xblock workbench
             return usage_id
 
-    @staticmethod
-    def _is_correct_input(item, val):
-        """
-        Is submitted numerical value within the tolerated margin for this item.
-        """
-        input_options = item.get('inputOptions')
-
-        if input_options:
-            try:
-                submitted_value = float(val)
-            except (ValueError, TypeError):
-                return False
-            else:
-                expected_value = input_options['value']
-                margin = input_options['margin']
-                return abs(submitted_value - expected_value) <= margin
-        else:
-            return True
-
     @staticmethod
     def workbench_scenarios():
         """
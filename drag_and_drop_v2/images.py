@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Probing of the intrinsic size of background images, without decoding them.
+
+The size is read from the image's header, for PNG, GIF, JPEG and SVG images, so that the block
+can lay out zones before the browser has downloaded the image.
+"""
+
+# Imports ###########################################################
+
+import re
+import struct
+
+import pkg_resources
+
+# Course assets can only be read inside edx-platform.
+try:
+    from xmodule.contentstore.content import StaticContent
+    from xmodule.contentstore.django import contentstore
+except ImportError:
+    StaticContent = contentstore = None
+
+
+# Globals ###########################################################
+
+DEFAULT_IMAGE_PATH = 'public/img/triangle.png'
+
+# Number of bytes at the start of an SVG image in which its root <svg> tag is looked for.
+SVG_HEAD_SIZE = 4096
+
+# Start tag of an SVG root element, and the attributes in it. SVG images are uploaded by authors,
+# so they are not parsed as XML, which would process their DTD (and any entities it declares).
+SVG_START_TAG_RE = re.compile(r'<(?:[\w.-]+:)?svg\b((?:[^<>"\']|"[^"]*"|\'[^\']*\')*)>')
+SVG_ATTRIBUTE_RE = re.compile(r'([\w.:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+# Size of the image used when the author has not set one; probed once per process.
+_default_image_size = []
+
+
+# Functions #########################################################
+
+def probe_image_size(data):
+    """
+    Returns the (width, height) in pixels of the PNG, GIF, JPEG or SVG image whose content
+    (or at least its beginning) is `data`, or None if it cannot be determined.
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n') and data[12:16] == b'IHDR':
+        return _positive(*struct.unpack('>II', data[16:24]))
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return _positive(*struct.unpack('<HH', data[6:10]))
+    if data.startswith(b'\xff\xd8'):
+        return _probe_jpeg(data)
+    if b'<svg' in data[:SVG_HEAD_SIZE]:
+        return _probe_svg(data[:SVG_HEAD_SIZE])
+    return None
+
+
+def get_default_image_size():
+    """
+    Returns the size of the bundled default background image.
+    """
+    if not _default_image_size:
+        _default_image_size.append(
+            probe_image_size(pkg_resources.resource_string(__name__, DEFAULT_IMAGE_PATH))
+        )
+    return _default_image_size[0]
+
+
+def get_course_asset(course_id, url):
+    """
+    Returns the content of the course asset at `url` (like "/static/image.png" or
+    "/asset-v1:org+course+run+type@asset+block@image.png"), or None if it cannot be read:
+    outside of edx-platform, or for images hosted elsewhere.
+    """
+    if contentstore is None or not url:
+        return None
+    try:
+        if url.startswith('/static/'):
+            location = StaticContent.compute_location(course_id, url[len('/static/'):])
+        else:
+            location = StaticContent.get_location_from_path(url.split('?')[0])
+        return contentstore().find(location).data
+    except Exception:  # pylint: disable=broad-except
+        # Missing asset, external URL or any other reason the asset cannot be read.
+        return None
+
+
+def _positive(width, height):
+    return (width, height) if width > 0 and height > 0 else None
+
+
+def _probe_jpeg(data):
+    """ Find the size in the first "start of frame" segment of a JPEG image """
+    offset = 2
+    while offset + 9 < len(data):
+        if data[offset:offset + 1] != b'\xff':
+            return None
+        marker = ord(data[offset + 1:offset + 2])
+        if marker == 0xff:  # Padding
+            offset += 1
+            continue
+        if marker == 0xd8 or 0xd0 <= marker <= 0xd7:  # Markers without a payload
+            offset += 2
+            continue
+        # SOF0-SOF15, except DHT (0xc4), JPG (0xc8) and DAC (0xcc), which share the range
+        if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return _positive(width, height)
+        offset += 2 + struct.unpack('>H', data[offset + 2:offset + 4])[0]
+    return None
+
+
+def _probe_svg(data):
+    """
+    Read the size of an SVG image from the width and height, or viewBox, of its root element.
+    Only the attributes of the root element's start tag are read; entities are not expanded.
+    """
+    match = SVG_START_TAG_RE.search(data)
+    if not match:
+        return None
+    attributes = {
+        name: double_quoted or single_quoted
+        for name, double_quoted, single_quoted in SVG_ATTRIBUTE_RE.findall(match.group(1))
+    }
+    width, height = _svg_length(attributes.get('width')), _svg_length(attributes.get('height'))
+    if width and height:
+        return _positive(width, height)
+    view_box = (attributes.get('viewBox') or '').replace(',', ' ').split()
+    if len(view_box) == 4:
+        try:
+            return _positive(float(view_box[2]), float(view_box[3]))
+        except ValueError:
+            return None
+    return None
+
+
+def _svg_length(value):
+    # Only absolute lengths in user units or pixels give an intrinsic size; "100%" does not.
+    match = re.match(r'^\s*([0-9]*\.?[0-9]+)\s*(px)?\s*$', value or '')
+    return float(match.group(1)) if match else None
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Optional instrumentation of the block's views and handlers.
+
+When enabled, each call to an instrumented view or handler records:
+
+* `wall_time`: the duration of the call, in seconds;
+* `field_reads`: the number of fields loaded from the field data store during the call;
+* `field_writes`: the number of fields the runtime has to save after the call;
+* `request_bytes` and `response_bytes`: the size of the request and response bodies
+  (for views, of the rendered fragment);
+* `error`: whether the call raised an exception or returned an error (4xx or 5xx) response.
+
+Field counts come from internals of the XBlock runtime, and are None with versions of XBlock
+that do not have them. Metrics are recorded for failed calls too, with the sizes that are known.
+
+The metrics are passed to a sink, selected with the 'instrumentation' key of the block's
+XBlock settings: "logging", "histogram", "null", or the dotted path of a sink class.
+Instrumentation is disabled (and costs one settings lookup per call) when the key is not set.
+"""
+
+# Imports ###########################################################
+
+import bisect
+import functools
+import importlib
+import json
+import logging
+import threading
+import time
+
+
+# Globals ###########################################################
+
+log = logging.getLogger(__name__)
+
+# Sink instances, shared by all blocks in the process, keyed by the value of the setting.
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+# Classes ###########################################################
+
+class NullSink(object):
+    """
+    Discards all metrics.
+    """
+
+    def record(self, name, metrics):
+        """
+        Record the `metrics` (a dict) of one call to the view or handler called `name`.
+        """
+        pass
+
+
+class LoggingSink(object):
+    """
+    Logs the metrics of every call.
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or log
+        self.level = level
+
+    def record(self, name, metrics):
+        self.logger.log(
+            self.level, "drag-and-drop-v2 %s: %s",
+            name, ", ".join("{}={}".format(key, value) for key, value in sorted(metrics.iteritems()))
+        )
+
+
+class HistogramSink(object):
+    """
+    Keeps every recorded value in memory, so that their distribution can be inspected.
+    Meant for tests and benchmarks; memory use grows with the number of calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def record(self, name, metrics):
+        with self._lock:
+            for metric, value in metrics.iteritems():
+                if value is not None:
+                    self._values.setdefault((name, metric), []).append(value)
+
+    def values(self, name, metric):
+        """
+        Returns the values recorded for `metric` of the view or handler called `name`, in order.
+        """
+        with self._lock:
+            return list(self._values.get((name, metric), []))
+
+    def histogram(self, name, metric, bounds):
+        """
+        Returns the number of recorded values of `metric` in each bucket delimited by the sorted
+        upper `bounds`, plus one bucket for the values above the last bound.
+        """
+        counts = [0] * (len(bounds) + 1)
+        for value in self.values(name, metric):
+            counts[bisect.bisect_left(bounds, value)] += 1
+        return counts
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+SINK_CLASSES = {
+    'null': NullSink,
+    'logging': LoggingSink,
+    'histogram': HistogramSink,
+}
+
+
+# Functions #########################################################
+
+def get_sink(setting):
+    """
+    Returns the sink selected by the value of the 'instrumentation' setting, or None if
+    instrumentation is disabled.
+    """
+    if not setting:
+        return None
+    sink = _sinks.get(setting)
+    if sink is None:
+        with _sinks_lock:
+            sink = _sinks.get(setting)
+            if sink is None:
+                sink = _sinks[setting] = _load_sink_class(setting)()
+    return sink
+
+
+def _load_sink_class(setting):
+    if setting in SINK_CLASSES:
+        return SINK_CLASSES[setting]
+    module_name, _, class_name = setting.rpartition('.')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def instrumented(name):
+    """
+    Decorator recording the metrics of calls to a view or handler of DragAndDropBlock, under `name`.
+    Must be applied outside of the XBlock.handler/json_handler decorators, whose markers it keeps.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(block, *args, **kwargs):
+            sink = get_sink(block.get_xblock_settings(default={}).get('instrumentation'))
+            if sink is None:
+                return func(block, *args, **kwargs)
+
+            loaded_fields = _loaded_fields(block)
+            start = time.time()
+            result, error = None, True
+            try:
+                result = func(block, *args, **kwargs)
+                error = getattr(result, 'status_code', 200) >= 400
+                return result
+            finally:
+                _record(sink, name, {
+                    'wall_time': time.time() - start,
+                    'field_reads': _count_new_fields(loaded_fields, _loaded_fields(block)),
+                    'field_writes': _count_fields_to_save(block),
+                    'request_bytes': _request_size(args),
+                    'response_bytes': _response_size(result),
+                    'error': error,
+                })
+        return wrapper
+    return decorator
+
+
+def _record(sink, name, metrics):
+    try:
+        sink.record(name, metrics)
+    except Exception:  # pylint: disable=broad-except
+        # Instrumentation must never break the block.
+        log.exception("Error recording metrics of %s", name)
+
+
+def _loaded_fields(block):
+    """
+    Returns the names of the fields the block has loaded from its field data, or None if the
+    XBlock runtime does not tell.
+    """
+    cache = getattr(block, '_field_data_cache', None)
+    return set(cache) if isinstance(cache, dict) else None
+
+
+def _count_new_fields(before, after):
+    if before is None or after is None:
+        return None
+    return len(after - before)
+
+
+def _count_fields_to_save(block):
+    get_fields_to_save = getattr(block, '_get_fields_to_save', None)
+    return len(get_fields_to_save()) if callable(get_fields_to_save) else None
+
+
+def _request_size(args):
+    request = args[0] if args else None
+    body = getattr(request, 'body', None)
+    return len(body) if body is not None else None
+
+
+def _response_size(result):
+    body = getattr(result, 'body', None)
+    if body is not None:  # webob Response
+        return len(body)
+    content = getattr(result, 'content', None)
+    if content is not None:  # Fragment
+        return len(content) + len(json.dumps(getattr(result, 'json_init_args', None) or {}))
+    return None
@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+#
+
+# Imports ###########################################################
+
+import copy
+import hashlib
+import json
+import math
+import re
+
+from .utils import _, LRUCache
+
+
+# Globals ###########################################################
+
+# Version of the normalized problem definition stored by `compile_definition`.
+# Definitions without a 'version' were saved by older versions of the block, and are normalized on load.
+DEFINITION_VERSION = 1
+
+# Layout used by old versions of the block, which stored item positions in pixels relative to a
+# 220px wide items column on the left of the image, with items 190px wide and 44px high by default.
+LEGACY_ITEMS_COLUMN_WIDTH = 220
+LEGACY_ITEM_WIDTH = 190
+LEGACY_ITEM_HEIGHT = 44
+
+# Upper bound of the number of rows (and columns) of a ZoneGrid.
+MAX_GRID_SIZE = 64
+
+# Compiled problems are shared by every block instance in the process, keyed by content fingerprint.
+_compiled_problems = LRUCache(max_size=256)
+
+
+# Functions #########################################################
+
+def fingerprint(data):
+    """
+    Return a short hash identifying the content of a problem's `data` field.
+    """
+    return hashlib.sha1(json.dumps(data, sort_keys=True)).hexdigest()
+
+
+def normalize_zone(zone):
+    """
+    Convert zone data from old to new format if necessary. Returns a new dict.
+    """
+    zone = zone.copy()
+    if "uid" not in zone:
+        zone["uid"] = zone.get("title")  # Older versions used title as the zone UID
+    # Remove old, now-unused zone attributes, if present:
+    zone.pop("id", None)
+    zone.pop("index", None)
+    return zone
+
+
+def compile_definition(data):
+    """
+    Validate a problem definition submitted by an author, and return it in normalized form:
+
+    * legacy zones get a `uid` (from their title, or generated) and lose their `id` and `index`;
+    * zone geometry and numerical input options are converted to numbers;
+    * items referring to a zone by its title are updated to use its UID;
+    * missing feedback texts are set to "";
+    * the result is marked with the current DEFINITION_VERSION.
+
+    Raises InvalidProblemDefinition if the definition cannot be used.
+    """
+    if not isinstance(data, dict):
+        raise InvalidProblemDefinition(_(u"The problem definition must be an object."))
+    if not isinstance(data.get('zones'), list) or not isinstance(data.get('items'), list):
+        raise InvalidProblemDefinition(_(u"The problem definition must include lists of zones and items."))
+
+    data = copy.deepcopy(data)
+    data['zones'] = _compile_zones(data['zones'])
+    zone_uids = {zone['uid']: zone['uid'] for zone in data['zones']}
+    for zone in data['zones']:
+        zone_uids.setdefault(zone.get('title'), zone['uid'])
+    data['items'] = _compile_items(data['items'], zone_uids)
+
+    feedback = data.get('feedback')
+    if not isinstance(feedback, dict):
+        feedback = {}
+    data['feedback'] = {'start': feedback.get('start') or '', 'finish': feedback.get('finish') or ''}
+
+    image_size = get_image_size(data)
+    if image_size:
+        _convert_to_percentages(data, *image_size)
+    else:
+        data.pop('targetImgWidth', None)
+        data.pop('targetImgHeight', None)
+
+    data['version'] = DEFINITION_VERSION
+    return data
+
+
+def get_image_size(data):
+    """
+    Returns the (width, height) in pixels of the background image of a problem definition,
+    or None if it is not known.
+    """
+    try:
+        width, height = float(data['targetImgWidth']), float(data['targetImgHeight'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (0 < width < float('inf') and 0 < height < float('inf')):
+        return None
+    return width, height
+
+
+def _convert_to_percentages(data, image_width, image_height):
+    """
+    Add the geometry of zones and the preferred widths of items, which authors define in pixels,
+    as percentages of the background image's size.
+    """
+    for zone in data['zones']:
+        if all(key in zone for key in ('x', 'y', 'width', 'height')):
+            zone['x_percent'] = zone['x'] / image_width * 100
+            zone['y_percent'] = zone['y'] / image_height * 100
+            zone['width_percent'] = zone['width'] / image_width * 100
+            zone['height_percent'] = zone['height'] / image_height * 100
+    for item in data['items']:
+        width = _pixels(item.get('size', {}).get('width')) if isinstance(item.get('size'), dict) else None
+        if 'widthPercent' not in item and width:
+            item['widthPercent'] = width / image_width * 100
+
+
+def css_float(value):
+    """ Parse a CSS length like "120.5px" or "12.5%" the way parseFloat does """
+    match = re.match(r'\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)', unicode(value)) if value is not None else None
+    return float(match.group(1)) if match else None
+
+
+def _pixels(value):
+    """ Parse a CSS size like "190px" the way parseInt does; returns None for "auto" etc. """
+    match = re.match(r'\s*(\d+)', unicode(value)) if value is not None else None
+    return int(match.group(1)) if match else None
+
+
+def _zone_rect(zone):
+    """ The (left, top, right, bottom) rectangle of a zone, in percent, or None if not known """
+    try:
+        left, top = float(zone['x_percent']), float(zone['y_percent'])
+        return left, top, left + float(zone['width_percent']), top + float(zone['height_percent'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _compile_zones(zones):
+    zones = [normalize_zone(_require_dict(zone, _(u"Each zone must be an object."))) for zone in zones]
+    used_uids = set(zone['uid'] for zone in zones if zone['uid'] is not None)
+    next_index = 1
+    for zone in zones:
+        if zone['uid'] is None:
+            while 'zone-{}'.format(next_index) in used_uids:
+                next_index += 1
+            zone['uid'] = 'zone-{}'.format(next_index)
+            used_uids.add(zone['uid'])
+        zone['uid'] = unicode(zone['uid'])
+        for key in ('x', 'y', 'width', 'height'):
+            if key in zone:
+                zone[key] = _to_number(
+                    zone[key], _(u"Zone \"{zone}\" has an invalid {key}."), zone=zone['uid'], key=key
+                )
+
+    uids = [zone['uid'] for zone in zones]
+    if len(set(uids)) != len(uids):
+        raise InvalidProblemDefinition(_(u"Each zone must have a different UID."))
+    return zones
+
+
+def _compile_items(items, zone_uids):
+    items = [_require_dict(item, _(u"Each item must be an object.")) for item in items]
+    for item in items:
+        try:
+            item['id'] = int(item['id'])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidProblemDefinition(_(u"Each item must have a numerical ID."))
+        zone = item.get('zone', 'none')
+        if zone != 'none':
+            if zone not in zone_uids:
+                raise InvalidProblemDefinition(
+                    _(u"Item {id} belongs to an unknown zone: \"{zone}\"."), id=item['id'], zone=zone
+                )
+            zone = zone_uids[zone]
+        item['zone'] = zone
+
+        feedback = item.get('feedback')
+        if not isinstance(feedback, dict):
+            feedback = {}
+        item['feedback'] = {'correct': feedback.get('correct') or '', 'incorrect': feedback.get('incorrect') or ''}
+
+        if 'inputOptions' in item:
+            options = _require_dict(item['inputOptions'], _(u"Item {id} has invalid input options."), id=item['id'])
+            message = _(u"Item {id} has an invalid numerical value or margin.")
+            item['inputOptions'] = {
+                'value': _to_number(options.get('value'), message, id=item['id']),
+                'margin': _to_number(options.get('margin', 0), message, id=item['id']),
+            }
+
+    ids = [item['id'] for item in items]
+    if len(set(ids)) != len(ids):
+        raise InvalidProblemDefinition(_(u"Each item must have a different ID."))
+    return items
+
+
+def _require_dict(value, message, **params):
+    if not isinstance(value, dict):
+        raise InvalidProblemDefinition(message, **params)
+    return value
+
+
+def _to_number(value, message, **params):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise InvalidProblemDefinition(message, **params)
+    if math.isnan(number) or math.isinf(number):
+        raise InvalidProblemDefinition(message, **params)
+    return int(number) if number.is_integer() else number
+
+
+def is_correct_input(item, val):
+    """
+    Is submitted numerical value within the tolerated margin for this item.
+    """
+    input_options = item.get('inputOptions')
+
+    if input_options:
+        try:
+            submitted_value = float(val)
+        except (ValueError, TypeError):
+            return False
+        else:
+            expected_value = input_options['value']
+            margin = input_options['margin']
+            return abs(submitted_value - expected_value) <= margin
+    else:
+        return True
+
+
+def get_compiled_problem(data):
+    """
+    Return the CompiledProblem for `data`, compiling it only if this content has not been seen before.
+    """
+    key = fingerprint(data)
+    problem = _compiled_problems.get(key)
+    if problem is None:
+        problem = CompiledProblem(data, key)
+        _compiled_problems.set(key, problem)
+    return problem
+
+
+def update_progress(progress, delta, sign=1):
+    """
+    Add (or, with sign=-1, subtract) one item's (placed, pending_input, correct) counts to `progress`.
+    """
+    placed, pending_input, correct = delta
+    progress['placed'] += sign * placed
+    progress['pending_input'] += sign * pending_input
+    progress['correct'] += sign * correct
+
+
+def progress_grade(progress, weight):
+    """
+    Returns the grade (out of `weight`) earned by a learner with the given progress counters.
+    """
+    return progress['correct'] / float(progress['total']) * weight
+
+
+def progress_is_finished(progress):
+    """
+    Are all items at their correct place, with a value submitted for each item that expects one,
+    for a learner with the given progress counters.
+    """
+    return progress['placed'] - progress['pending_input'] == progress['total']
+
+
+# Classes ###########################################################
+
+class ZoneGrid(object):
+    """
+    Spatial index over the zones whose geometry is known in percentages of the background image
+    (see `compile_definition`), for finding the zones at a point without testing every zone.
+
+    The image is divided into a uniform grid of about one cell per zone, and each cell lists the
+    zones overlapping it. The client builds the same index to find the zone under the pointer.
+    """
+
+    def __init__(self, zones):
+        self.rects = {}
+        uids = []
+        for zone in zones:
+            rect = _zone_rect(zone)
+            if rect is not None and zone['uid'] not in self.rects:
+                self.rects[zone['uid']] = rect
+                uids.append(zone['uid'])
+
+        self.size = max(1, min(MAX_GRID_SIZE, int(math.ceil(math.sqrt(len(uids))))))
+        self.cells = {}
+        for uid in uids:
+            left, top, right, bottom = self.rects[uid]
+            for column in range(self._cell_index(left), self._cell_index(right) + 1):
+                for row in range(self._cell_index(top), self._cell_index(bottom) + 1):
+                    self.cells.setdefault((column, row), []).append(uid)
+
+    def _cell_index(self, percent):
+        return max(0, min(self.size - 1, int(percent * self.size // 100)))
+
+    def zones_at(self, x_percent, y_percent):
+        """
+        Returns the UIDs of the zones containing the point, in the order they are defined.
+        """
+        cell = (self._cell_index(x_percent), self._cell_index(y_percent))
+        return [uid for uid in self.cells.get(cell, ()) if self.contains(uid, x_percent, y_percent)]
+
+    def contains(self, uid, x_percent, y_percent, margin=0):
+        """
+        Does the zone `uid`, extended by `margin` percent on each side, contain the point?
+        Returns None if the zone's geometry is not known.
+        """
+        rect = self.rects.get(uid)
+        if rect is None:
+            return None
+        left, top, right, bottom = rect
+        return left - margin <= x_percent <= right + margin and top - margin <= y_percent <= bottom + margin
+
+
+class InvalidProblemDefinition(ValueError):
+    """
+    Raised by compile_definition when a problem definition cannot be used.
+
+    `template` is the untranslated message, with {placeholders} for the `params`, which may
+    contain author text. Use `translate` to get the message in the author's language.
+    """
+
+    def __init__(self, template, **params):
+        super(InvalidProblemDefinition, self).__init__(template)
+        self.template = template
+        self.params = params
+
+    def translate(self, ugettext):
+        """
+        Returns the message, translated with the `ugettext` function.
+        """
+        return ugettext(self.template).format(**self.params)
+
+    def __unicode__(self):
+        return self.template.format(**self.params)
+
+
+class CompiledProblem(object):
+    """
+    Read-only index over the author-defined problem data.
+
+    Holds a private copy of the data, so that it remains valid even if the block's `data` field
+    is later modified in place. Callers must not modify anything returned from this object.
+    """
+
+    def __init__(self, data, key=None):
+        data = copy.deepcopy(data)
+        self.fingerprint = key or fingerprint(data)
+        self.data = data
+
+        if data.get('version') == DEFINITION_VERSION:
+            self.zones = data['zones']  # Already normalized by compile_definition
+        else:
+            self.zones = [normalize_zone(zone) for zone in data.get('zones', [])]
+        self.zones_by_uid = {}
+        for zone in self.zones:
+            # Keep the first zone if several share a UID, as a linear search would.
+            self.zones_by_uid.setdefault(zone['uid'], zone)
+
+        self.image_size = get_image_size(data)
+        self.zone_grid = ZoneGrid(self.zones)
+
+        self.items = data.get('items', [])
+        self.items_by_id = {}
+        for item in self.items:
+            self.items_by_id.setdefault(item['id'], item)
+        # Item state is keyed by the string form of item IDs:
+        self.items_by_key = {str(item_id): item for item_id, item in self.items_by_id.iteritems()}
+
+        # Items that belong to a zone count towards the grade; decoy items (zone "none") do not.
+        self.graded_item_ids = frozenset(str(item['id']) for item in self.items if item['zone'] != 'none')
+        self.input_item_ids = frozenset(
+            str(item['id']) for item in self.items if item['zone'] != 'none' and 'inputOptions' in item
+        )
+
+    def get_item(self, item_id):
+        """
+        Returns definition (settings) for item identified by `item_id`. Raises KeyError if there is no such item.
+        """
+        return self.items_by_id[item_id]
+
+    def get_zone(self, uid):
+        """
+        Given a zone UID, return that zone, or None.
+        """
+        return self.zones_by_uid.get(uid)
+
+    def migrate_item_state(self, item_state):
+        """
+        Convert the positions of items in the (dict form) learner state `item_state` that were
+        saved in pixels by old versions of the block to percentages of the background image's
+        size, in place. Does nothing if the image's size is not known.
+        """
+        if not self.image_size:
+            return
+        image_width, image_height = self.image_size
+        for item_key, state in item_state.iteritems():
+            if 'x_percent' in state or 'left' not in state or 'top' not in state:
+                continue
+            size = self.items_by_key.get(item_key, {}).get('size')
+            size = size if isinstance(size, dict) else {}
+            width = _pixels(size.get('width')) or LEGACY_ITEM_WIDTH
+            height = _pixels(size.get('height')) or LEGACY_ITEM_HEIGHT
+            left, top = css_float(state['left']), css_float(state['top'])
+            if left is None or top is None:
+                continue
+            left -= LEGACY_ITEMS_COLUMN_WIDTH
+            state['x_percent'] = (left + width / 2.0) / image_width * 100
+            state['y_percent'] = (top + height / 2.0) / image_height * 100
+            for key in ('left', 'top', 'absolute'):
+                state.pop(key, None)
+
+    def item_progress(self, item_key, state):
+        """
+        Returns how the item identified by `item_key` (a string ID), with learner state `state`
+        (None if not placed), counts towards the learner's progress, as a tuple of 0/1 values:
+        (placed, pending_input, correct).
+
+        An item placed in a zone that is no longer its correct zone (after the author changed it)
+        does not count. Legacy states that do not record the zone are taken to be correct, as the
+        block only saves correct placements.
+        """
+        if state is None or item_key not in self.graded_item_ids:
+            return (0, 0, 0)
+        if 'zone' in state and state['zone'] != self.items_by_key[item_key]['zone']:
+            return (0, 0, 0)
+        if item_key in self.input_item_ids and 'input' not in state:
+            return (1, 1, 0)
+        return (1, 0, int(is_correct_input(self.items_by_key[item_key], state.get('input'))))
+
+    def compute_progress(self, item_state):
+        """
+        Returns progress counters for the given (dict form) learner item state, computed from scratch.
+        """
+        progress = self.empty_progress()
+        for item_key, state in item_state.iteritems():
+            update_progress(progress, self.item_progress(item_key, state))
+        return progress
+
+    def empty_progress(self):
+        """
+        Returns progress counters for a learner who has not placed any item yet.
+        """
+        return {
+            'problem': self.fingerprint,
+            'total': len(self.graded_item_ids),
+            'placed': 0,
+            'pending_input': 0,
+            'correct': 0,
+        }
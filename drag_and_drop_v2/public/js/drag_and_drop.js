@@ -18,6 +18,50 @@ function DragNDropTemplates(url_name) {
         }, 0);
     };
 
+    /**
+     * MemoThunk: a virtual-dom thunk that renders `template` with `args`, unless the thunk it
+     * replaces rendered the same template with equal arguments (compared a few levels deep). In
+     * that case the previous virtual tree is reused, and virtual-dom does not diff it again.
+     * Templates rendered this way must only depend on their arguments.
+     */
+    var MemoThunk = function(key, template, args) {
+        if (!(this instanceof MemoThunk)) {
+            return new MemoThunk(key, template, args);
+        }
+        this.key = key;
+        this.template = template;
+        this.args = args;
+    };
+
+    MemoThunk.prototype.type = 'Thunk';
+
+    MemoThunk.prototype.render = function(previous) {
+        if (previous && previous.vnode && previous.template === this.template &&
+                isEqual(previous.args, this.args, 3)) {
+            return previous.vnode;
+        }
+        return this.template.apply(null, this.args);
+    };
+
+    var isEqual = function(a, b, depth) {
+        if (a === b) {
+            return true;
+        }
+        if (depth === 0 || !a || !b || typeof a !== 'object' || typeof b !== 'object') {
+            return false;
+        }
+        var keys = Object.keys(a);
+        if (keys.length !== Object.keys(b).length) {
+            return false;
+        }
+        for (var i = 0; i < keys.length; i++) {
+            if (!b.hasOwnProperty(keys[i]) || !isEqual(a[keys[i]], b[keys[i]], depth - 1)) {
+                return false;
+            }
+        }
+        return true;
+    };
+
     var itemSpinnerTemplate = function(xhr_active) {
         if (!xhr_active) {
             return null;
@@ -52,17 +96,40 @@ function DragNDropTemplates(url_name) {
         );
     };
 
+    // Zone titles by UID, for the zones they were computed from
+    var zoneTitles = {};
+    var zoneTitlesSource = null;
+
     var getZoneTitle = function(zoneUID, ctx) {
         // Given the context and a zone UID, return the zone's title
-        for (var i = 0; i < ctx.zones.length; i++) {
-            if (ctx.zones[i].uid === zoneUID) {
-                return ctx.zones[i].title;
-            }
+        if (ctx.zones !== zoneTitlesSource) {
+            zoneTitles = {};
+            ctx.zones.forEach(function(zone) {
+                if (!zoneTitles.hasOwnProperty(zone.uid)) {
+                    zoneTitles[zone.uid] = zone.title;
+                }
+            });
+            zoneTitlesSource = ctx.zones;
+        }
+        if (zoneTitles.hasOwnProperty(zoneUID)) {
+            return zoneTitles[zoneUID];
         }
         return "Unknown Zone";  // This title should never be seen, so does not need i18n
-    }
+    };
 
-    var itemTemplate = function(item, ctx) {
+    var itemKey = function(item) {
+        // Unique key for virtual dom change tracking. Key must be different for
+        // Placed vs Unplaced, or weird bugs can occur.
+        return item.value + (item.is_placed ? "-p" : "-u");
+    };
+
+    var itemThunk = function(item, ctx) {
+        // Only the items whose properties changed since the last render are rendered again.
+        var zone_title = item.is_placed ? getZoneTitle(item.zone, ctx) : null;
+        return MemoThunk(itemKey(item), itemTemplate, [item, ctx.bg_image_width, zone_title]);
+    };
+
+    var itemTemplate = function(item, bg_image_width, zone_title) {
         // Define properties
         var className = (item.class_name) ? item.class_name : "";
         if (item.has_image) {
@@ -108,7 +175,7 @@ function DragNDropTemplates(url_name) {
                 // wide as the image, then the background image will be scaled down and this
                 // pixel value would be too large, so we also specify it as a max-width
                 // percentage.
-                style.width = (item.widthPercent / 100 * ctx.bg_image_width) + "px";
+                style.width = (item.widthPercent / 100 * bg_image_width) + "px";
                 style.maxWidth = item.widthPercent + "%";
             }
         }
@@ -129,7 +196,7 @@ function DragNDropTemplates(url_name) {
             var item_description = h(
                 'div',
                 { id: item_description_id, className: 'sr' },
-                gettext('Correctly placed in: ') + getZoneTitle(item.zone, ctx)
+                gettext('Correctly placed in: ') + zone_title
             );
             children.splice(1, 0, item_description);
         }
@@ -138,9 +205,7 @@ function DragNDropTemplates(url_name) {
             h(
                 'div.option',
                 {
-                    // Unique key for virtual dom change tracking. Key must be different for
-                    // Placed vs Unplaced, or weird bugs can occur.
-                    key: item.value + (item.is_placed ? "-p" : "-u"),
+                    key: itemKey(item),
                     className: className,
                     attributes: attributes,
                     style: style
@@ -150,9 +215,13 @@ function DragNDropTemplates(url_name) {
         );
     };
 
-    var zoneTemplate = function(zone, ctx) {
-        var className = ctx.display_zone_labels ? 'zone-name' : 'zone-name sr';
-        var selector = ctx.display_zone_borders ? 'div.zone.zone-with-borders' : 'div.zone';
+    var zoneThunk = function(zone, ctx) {
+        return MemoThunk(undefined, zoneTemplate, [zone, ctx.display_zone_labels, ctx.display_zone_borders]);
+    };
+
+    var zoneTemplate = function(zone, display_zone_labels, display_zone_borders) {
+        var className = display_zone_labels ? 'zone-name' : 'zone-name sr';
+        var selector = display_zone_borders ? 'div.zone.zone-with-borders' : 'div.zone';
         return (
             h(
                 selector,
@@ -195,7 +264,7 @@ function DragNDropTemplates(url_name) {
         );
     };
 
-    var keyboardHelpTemplate = function(ctx) {
+    var keyboardHelpTemplate = function() {
         var dialog_attributes = { role: 'dialog', 'aria-labelledby': 'modal-window-title' };
         var dialog_style = {};
         return (
@@ -245,7 +314,7 @@ function DragNDropTemplates(url_name) {
                 h('section.drag-container', { attributes: { role: 'application' } }, [
                     h(
                         'div.item-bank',
-                        renderCollection(itemTemplate, items_in_bank, ctx)
+                        renderCollection(itemThunk, items_in_bank, ctx)
                     ),
                     h('div.target',
                         {
@@ -270,12 +339,13 @@ function DragNDropTemplates(url_name) {
                                 h('img.target-img', {src: ctx.target_img_src, alt: ctx.target_img_description}),
                             ]
                         ),
-                        renderCollection(zoneTemplate, ctx.zones, ctx),
-                        renderCollection(itemTemplate, items_placed, ctx),
+                        renderCollection(zoneThunk, ctx.zones, ctx),
+                        renderCollection(itemThunk, items_placed, ctx),
                     ]
                     ),
                 ]),
-                keyboardHelpTemplate(ctx),
+                // The dialog never changes: it is rendered once.
+                MemoThunk(undefined, keyboardHelpTemplate, []),
                 feedbackTemplate(ctx),
             ])
         );
@@ -285,6 +355,370 @@ function DragNDropTemplates(url_name) {
 
 }
 
+/**
+ * Spatial index over the zones (whose geometry is in percentages of the background image), for
+ * finding the zones at a point without testing every zone. Mirrors ZoneGrid in problem.py: the
+ * image is divided into a uniform grid of about one cell per zone, and each cell lists the zones
+ * overlapping it.
+ */
+function DragNDropZoneGrid(zones) {
+    "use strict";
+
+    var MAX_GRID_SIZE = 64;
+    var size = Math.max(1, Math.min(MAX_GRID_SIZE, Math.ceil(Math.sqrt(zones.length))));
+    var cells = {};
+
+    var cellIndex = function(percent) {
+        return Math.max(0, Math.min(size - 1, Math.floor(percent * size / 100)));
+    };
+
+    var contains = function(zone, x, y) {
+        return (
+            x >= zone.x_percent && x <= zone.x_percent + zone.width_percent &&
+            y >= zone.y_percent && y <= zone.y_percent + zone.height_percent
+        );
+    };
+
+    zones.forEach(function(zone) {
+        var lastColumn = cellIndex(zone.x_percent + zone.width_percent);
+        var lastRow = cellIndex(zone.y_percent + zone.height_percent);
+        for (var column = cellIndex(zone.x_percent); column <= lastColumn; column++) {
+            for (var row = cellIndex(zone.y_percent); row <= lastRow; row++) {
+                var key = column + ',' + row;
+                (cells[key] = cells[key] || []).push(zone);
+            }
+        }
+    });
+
+    return {
+        /** Returns the zones containing the point, in the order they are defined. */
+        zonesAt: function(x_percent, y_percent) {
+            var candidates = cells[cellIndex(x_percent) + ',' + cellIndex(y_percent)] || [];
+            return candidates.filter(function(zone) { return contains(zone, x_percent, y_percent); });
+        }
+    };
+}
+
+/**
+ * Page-level dispatcher of document (and window) events, shared by all instances of the block on
+ * the page: see DragNDropPageEvents.shared().
+ *
+ * A single listener is bound for each event type, and only while some instance needs it. It
+ * calls the handlers of the instances that registered one, which they only do while they need
+ * to (e.g. while their feedback popup is open), so events do not run a handler for every block
+ * on the page.
+ *
+ * When the element of an instance is removed from the page, its handlers are unregistered and
+ * its teardown callbacks called. Removals are detected with a MutationObserver, which observes
+ * the page only while some instance has a teardown callback; without MutationObserver support,
+ * they are detected whenever an instance registers a handler or callback, or an event arrives.
+ */
+function DragNDropPageEvents() {
+    "use strict";
+
+    var NAMESPACE = '.dndPage';
+    var registrations = [];  // {owner, target, type, handler}
+    var teardowns = [];  // {owner, callback, seen}: seen is true once the owner has been on the page
+    var observer = null;
+
+    var isAttached = function(owner) {
+        return document.documentElement.contains(owner);
+    };
+
+    var matches = function(registration, owner, target, type, handler) {
+        return (
+            registration.owner === owner && registration.target === target &&
+            registration.type === type && (!handler || registration.handler === handler)
+        );
+    };
+
+    var isListening = function(target, type) {
+        return registrations.some(function(registration) {
+            return registration.target === target && registration.type === type;
+        });
+    };
+
+    var dispatch = function(target, type, evt) {
+        registrations.slice().forEach(function(registration) {
+            if (registration.target !== target || registration.type !== type ||
+                    registrations.indexOf(registration) === -1) {  // Removed by a previous handler
+                return;
+            }
+            if (!isAttached(registration.owner)) {
+                teardown(registration.owner);
+                return;
+            }
+            registration.handler(evt);
+        });
+    };
+
+    var on = function(owner, target, types, handler) {
+        types.split(' ').forEach(function(type) {
+            if (!isListening(target, type)) {
+                $(target).on(type + NAMESPACE, function(evt) { dispatch(target, type, evt); });
+            }
+            if (!registrations.some(function(r) { return matches(r, owner, target, type, handler); })) {
+                registrations.push({owner: owner, target: target, type: type, handler: handler});
+            }
+        });
+    };
+
+    var off = function(owner, target, types, handler) {
+        types.split(' ').forEach(function(type) {
+            registrations = registrations.filter(function(r) { return !matches(r, owner, target, type, handler); });
+            if (!isListening(target, type)) {
+                $(target).off(type + NAMESPACE);
+            }
+        });
+    };
+
+    var teardown = function(owner) {
+        var removed = registrations.filter(function(r) { return r.owner === owner; });
+        removed.forEach(function(r) { off(owner, r.target, r.type, r.handler); });
+        var callbacks = teardowns.filter(function(t) { return t.owner === owner; });
+        teardowns = teardowns.filter(function(t) { return t.owner !== owner; });
+        updateObserver();
+        callbacks.forEach(function(t) { t.callback(); });
+    };
+
+    // Tear down the owners that have been removed from the page. Owners that have not been on
+    // the page yet (e.g. a block initialized before its element is inserted) are left alone.
+    var sweep = function() {
+        teardowns.slice().forEach(function(t) {
+            if (isAttached(t.owner)) {
+                t.seen = true;
+            } else if (t.seen) {
+                teardown(t.owner);
+            }
+        });
+    };
+
+    var updateObserver = function() {
+        if (!window.MutationObserver) {
+            return;
+        }
+        if (teardowns.length && !observer) {
+            observer = new MutationObserver(sweep);
+            observer.observe(document.documentElement, {childList: true, subtree: true});
+        } else if (!teardowns.length && observer) {
+            observer.disconnect();
+            observer = null;
+        }
+    };
+
+    return {
+        /**
+         * Call `handler` with the events of the space-separated `types` on `target` (document or
+         * window), on behalf of the block whose element is `owner`.
+         */
+        on: function(owner, target, types, handler) {
+            sweep();
+            on(owner, target, types, handler);
+        },
+        /** Stop calling `handler` (or all of the owner's handlers) with those events. */
+        off: off,
+        /** Call on(...) or off(...), depending on `enable`. */
+        toggle: function(enable, owner, target, types, handler) {
+            (enable ? on : off)(owner, target, types, handler);
+        },
+        /** Set the callback called when the owner is torn down. */
+        onTeardown: function(owner, callback) {
+            sweep();
+            teardowns.push({owner: owner, callback: callback, seen: isAttached(owner)});
+            updateObserver();
+        },
+        /** Unregister all of the owner's handlers, and call its teardown callbacks. */
+        teardown: teardown
+    };
+}
+
+/** Returns the dispatcher shared by all instances of the block on the page. */
+DragNDropPageEvents.shared = function() {
+    if (!DragNDropPageEvents.instance) {
+        DragNDropPageEvents.instance = DragNDropPageEvents();
+    }
+    return DragNDropPageEvents.instance;
+};
+
+/**
+ * A small drag engine for the items, built on Pointer Events (with a fallback on mouse and touch
+ * events for browsers that lack them).
+ *
+ * An item follows the pointer (moved with a CSS transform, within the bounds of the container)
+ * once it has moved a few pixels from where it was pressed. When it is released over a drop
+ * target, options.drop is called; otherwise the item slides back to where it was. Positions are
+ * measured once, when the drag starts, so that moving the pointer never reads the layout.
+ *
+ * options:
+ *   container: function returning the element the items must stay within while dragged
+ *   targetAt(point): returns the drop target at a point ({x, y} in page coordinates), if any
+ *   start($item), hover($target), drop($target, $item), stop($item): callbacks; hover is called
+ *     with the target under the pointer whenever it changes, and with null when the drag ends
+ */
+function DragNDropDragEngine(options) {
+    "use strict";
+
+    var DRAG_THRESHOLD = 3;  // Distance (px) the pointer must move before a press becomes a drag
+    var REVERT_DURATION = 150;  // ms
+    var NAMESPACE = '.dndDrag';
+
+    var usePointerEvents = Boolean(window.PointerEvent);
+    var START_EVENTS = usePointerEvents ? ['pointerdown'] : ['mousedown', 'touchstart'];
+    var MOVE_EVENTS = usePointerEvents ? ['pointermove'] : ['mousemove', 'touchmove'];
+    var END_EVENTS = usePointerEvents ? ['pointerup', 'pointercancel'] : ['mouseup', 'touchend', 'touchcancel'];
+
+    var drag = null;  // The current press or drag
+
+    var getPoint = function(evt) {
+        var source = evt.changedTouches ? evt.changedTouches[0] : evt;
+        return {x: source.pageX, y: source.pageY};
+    };
+
+    // Bounding box of an element, in page coordinates (which do not change when the page scrolls)
+    var getPageRect = function(element) {
+        var rect = element.getBoundingClientRect();
+        var scrollX = window.pageXOffset;
+        var scrollY = window.pageYOffset;
+        return {
+            left: rect.left + scrollX, right: rect.right + scrollX,
+            top: rect.top + scrollY, bottom: rect.bottom + scrollY
+        };
+    };
+
+    var clamp = function(value, min, max) {
+        return Math.max(min, Math.min(max, value));
+    };
+
+    var listen = function(enable) {
+        var method = enable ? 'addEventListener' : 'removeEventListener';
+        // Listeners must not be passive, so that moves can prevent touch scrolling.
+        var listenerOptions = {passive: false, capture: false};
+        MOVE_EVENTS.forEach(function(type) { document[method](type, onMove, listenerOptions); });
+        END_EVENTS.forEach(function(type) { document[method](type, onEnd, listenerOptions); });
+    };
+
+    var onPress = function(jqueryEvent) {
+        var evt = jqueryEvent.originalEvent;
+        var isTouch = evt.type === 'touchstart' || evt.pointerType === 'touch';
+        if (drag || evt.isPrimary === false || (!isTouch && evt.button !== 0)) {
+            return;
+        }
+        drag = {
+            item: this,
+            start: getPoint(evt),
+            pointerId: evt.pointerId,
+            started: false
+        };
+        listen(true);
+        if (evt.type !== 'touchstart') {
+            // Prevent text selection, and the mouse events that would follow pointer events.
+            evt.preventDefault();
+        }
+    };
+
+    var begin = function() {
+        var itemRect = getPageRect(drag.item);
+        var containerRect = getPageRect(options.container());
+        drag.bounds = {
+            minX: containerRect.left - itemRect.left, maxX: containerRect.right - itemRect.right,
+            minY: containerRect.top - itemRect.top, maxY: containerRect.bottom - itemRect.bottom
+        };
+        drag.started = true;
+        drag.target = null;
+        $(drag.item).addClass('dragging');
+        options.start($(drag.item));
+    };
+
+    var setTarget = function(target) {
+        if (target !== drag.target) {
+            drag.target = target;
+            options.hover(target && $(target));
+        }
+    };
+
+    var onMove = function(evt) {
+        if (evt.pointerId !== drag.pointerId) {
+            return;
+        }
+        var point = getPoint(evt);
+        var dx = point.x - drag.start.x;
+        var dy = point.y - drag.start.y;
+        if (!drag.started) {
+            if (Math.abs(dx) < DRAG_THRESHOLD && Math.abs(dy) < DRAG_THRESHOLD) {
+                return;
+            }
+            begin();
+        }
+        evt.preventDefault();
+        dx = clamp(dx, drag.bounds.minX, drag.bounds.maxX);
+        dy = clamp(dy, drag.bounds.minY, drag.bounds.maxY);
+        drag.item.style.transform = 'translate(' + dx + 'px, ' + dy + 'px)';
+        setTarget(options.targetAt(point));
+    };
+
+    var onEnd = function(evt) {
+        if (evt.pointerId !== drag.pointerId) {
+            return;
+        }
+        listen(false);
+        if (!drag.started) {
+            drag = null;
+            return;  // A click or tap, not a drag
+        }
+        var target = evt.type.indexOf('cancel') === -1 ? options.targetAt(getPoint(evt)) : null;
+        setTarget(null);
+        var current = drag;
+        drag = null;
+        if (target) {
+            // The item's position is read by the drop handler before it is reset.
+            options.drop($(target), $(current.item));
+            finish(current.item);
+        } else {
+            revert(current.item);
+        }
+    };
+
+    var revert = function(item) {
+        item.style.transition = 'transform ' + REVERT_DURATION + 'ms';
+        item.style.transform = 'translate(0, 0)';
+        setTimeout(function() { finish(item); }, REVERT_DURATION);
+    };
+
+    var finish = function(item) {
+        item.style.transition = '';
+        item.style.transform = '';
+        $(item).removeClass('dragging');
+        options.stop($(item));
+    };
+
+    var preventNativeDrag = function(evt) {
+        evt.preventDefault();
+    };
+
+    return {
+        /**
+         * Make the elements matching `selector` within `$container` draggable. Events are
+         * delegated to the container, so that elements start or stop being draggable as they
+         * start or stop matching the selector, without any handler being attached to them.
+         */
+        bind: function($container, selector) {
+            START_EVENTS.forEach(function(type) { $container.on(type + NAMESPACE, selector, onPress); });
+            $container.on('dragstart' + NAMESPACE, selector, preventNativeDrag);
+        },
+        /** Stop handling the elements of `$container`, abandoning any press or drag in progress. */
+        unbind: function($container) {
+            $container.off(NAMESPACE);
+            if (drag) {
+                if (drag.started) {
+                    setTarget(null);
+                }
+                drag = null;
+                listen(false);
+            }
+        }
+    };
+}
+
 function DragAndDropBlock(runtime, element, configuration) {
     "use strict";
 
@@ -299,13 +733,25 @@ function DragAndDropBlock(runtime, element, configuration) {
     var $root = $element.find('.xblock--drag-and-drop');
     var root = $root[0];
 
+    // Document events are routed to the block by the dispatcher shared by all blocks on the page.
+    var pageEvents = DragNDropPageEvents.shared();
+
     var state = undefined;
+    var itemsById = {};  // Items of configuration.items, by ID
     var bgImgNaturalWidth = undefined; // pixel width of the background image (when not scaled)
     var __vdom = virtualDom.h();  // blank virtual DOM
 
     // Event string size limit.
     var MAX_LENGTH = 255;
 
+    // When configuration.batch_events is set, analytics events are queued and sent together once
+    // EVENT_BATCH_SIZE events are waiting, EVENT_BATCH_DELAY ms after the first one, or when the
+    // page is hidden or unloaded.
+    var EVENT_BATCH_SIZE = 10;
+    var EVENT_BATCH_DELAY = 5000;
+    var eventQueue = [];
+    var eventFlushTimer = null;
+
     // Keyboard accessibility
     var ESC = 27;
     var RET = 13;
@@ -317,29 +763,55 @@ function DragAndDropBlock(runtime, element, configuration) {
     var $selectedItem;
     var $focusedElement;
 
+    // When configuration.lazy_hydration is set, the block is initialized once it is within
+    // LAZY_HYDRATION_MARGIN of the viewport; until then, the placeholder rendered by the server
+    // reserves its space on the page.
+    var LAZY_HYDRATION_MARGIN = '300px';
+
+    var hydrate = function() {
+        if (!configuration.lazy_hydration || !window.IntersectionObserver) {
+            init();
+            return;
+        }
+        var observer = new IntersectionObserver(function(entries) {
+            var visible = entries.some(function(entry) { return entry.isIntersecting; });
+            if (visible) {
+                observer.disconnect();
+                init();
+            }
+        }, {rootMargin: LAZY_HYDRATION_MARGIN});
+        observer.observe(element);
+    };
+
     var init = function() {
         // Load the current user state, and load the image, then render the block.
-        // We load the user state via AJAX rather than passing it in statically (like we do with
-        // configuration) due to how the LMS handles unit tabs. If you click on a unit with this
-        // block, make changes, click on the tab for another unit, then click back, this block
-        // would re-initialize with the old state. To avoid that, we always fetch the state
-        // using AJAX during initialization.
         $.when(
-            $.ajax(runtime.handlerUrl(element, 'get_user_state'), {dataType: 'json'}),
-            loadBackgroundImage()
-        ).done(function(stateResult, bgImg){
+            loadUserState(),
+            getBackgroundImageSize()
+        ).done(function(userState, bgImg){
             // Render problem
             configuration.zones.forEach(function (zone) {
                 computeZoneDimension(zone, bgImg.width, bgImg.height);
             });
-            state = stateResult[0]; // stateResult is an array of [data, statusText, jqXHR]
+            configuration.items.forEach(function(item) {
+                itemsById[item.id] = item;
+            });
+            zoneGrid = DragNDropZoneGrid(configuration.zones);
+            configuration.zones.forEach(function(zone, index) {
+                zoneIndexes[zone.uid] = index;
+            });
+            state = userState;
             migrateConfiguration(bgImg.width);
             migrateState(bgImg.width, bgImg.height);
             bgImgNaturalWidth = bgImg.width;
 
             // Set up event handlers:
 
-            $(document).on('keydown mousedown touchstart', closePopup);
+            // Remove the block's handlers from the page when its element has been removed.
+            pageEvents.onTeardown(element, function() {
+                flushEventsOnExit();
+                dragEngine.unbind($element);
+            });
             $element.on('click', '.keyboard-help-button', showKeyboardHelp);
             $element.on('keydown', '.keyboard-help-button', function(evt) {
                 runOnKey(evt, RET, showKeyboardHelp);
@@ -355,6 +827,8 @@ function DragAndDropBlock(runtime, element, configuration) {
             element.addEventListener('load', webkitFix, true);
 
             applyState();
+            flushUpdate();  // Render now, rather than on the next animation frame
+            initDraggable();
             initDroppable();
 
             // Indicate that problem is done loading
@@ -411,7 +885,7 @@ function DragAndDropBlock(runtime, element, configuration) {
         focusModalButton();
 
         // Set up event handlers
-        $(document).on('keydown', keyboardEventDispatcher);
+        pageEvents.on(element, document, 'keydown', keyboardEventDispatcher);
         $keyboardHelpDialog.find('.modal-dismiss-button').on('click', hideKeyboardHelp);
     };
 
@@ -427,10 +901,64 @@ function DragAndDropBlock(runtime, element, configuration) {
         $focusedElement.focus();
 
         // Remove event handlers
-        $(document).off('keydown', keyboardEventDispatcher);
+        pageEvents.off(element, document, 'keydown', keyboardEventDispatcher);
         $keyboardHelpDialog.find('.modal-dismiss-button').off();
     };
 
+    /**
+     * The latest user state version this page has seen for each block, keyed by the block's
+     * 'get_user_state' URL. Shared by all instances of this block on the page.
+     */
+    DragAndDropBlock.stateVersions = DragAndDropBlock.stateVersions || {};
+    var stateVersionKey = runtime.handlerUrl(element, 'get_user_state');
+
+    var setStateVersion = function(version) {
+        var latest = DragAndDropBlock.stateVersions[stateVersionKey];
+        if (latest === undefined || version > latest) {
+            DragAndDropBlock.stateVersions[stateVersionKey] = version;
+        }
+    };
+
+    /**
+     * Get the current user state.
+     * The state is embedded in the configuration, but due to how the LMS handles unit tabs it may
+     * be stale: If you click on a unit with this block, make changes, click on the tab for another
+     * unit, then click back, this block would re-initialize with the old state. That case is
+     * detected by comparing state versions, and the fresh state is then fetched using AJAX.
+     */
+    var loadUserState = function() {
+        var promise = $.Deferred();
+        var embeddedState = configuration.user_state;
+        var latestVersion = DragAndDropBlock.stateVersions[stateVersionKey];
+        if (latestVersion !== undefined && latestVersion > embeddedState.state_version) {
+            $.ajax(runtime.handlerUrl(element, 'get_user_state'), {dataType: 'json'})
+                .done(function(data) {
+                    setStateVersion(data.state_version);
+                    promise.resolve(data);
+                })
+                .fail(function() { promise.reject(); });
+        } else {
+            setStateVersion(embeddedState.state_version);
+            // Copy the state: it is modified as the learner interacts with the block.
+            promise.resolve($.extend(true, {}, embeddedState));
+        }
+        return promise;
+    };
+
+    /**
+     * Get the intrinsic size of the background image. The server sends it when it could read
+     * the image; only wait for the image to load when it could not.
+     */
+    var getBackgroundImageSize = function() {
+        if (configuration.target_img_width && configuration.target_img_height) {
+            return $.Deferred().resolve({
+                width: configuration.target_img_width,
+                height: configuration.target_img_height
+            }).promise();
+        }
+        return loadBackgroundImage();
+    };
+
     /** Asynchronously load the main background image used for this block. */
     var loadBackgroundImage = function() {
         var promise = $.Deferred();
@@ -448,7 +976,11 @@ function DragAndDropBlock(runtime, element, configuration) {
         return promise;
     };
 
-    /** Zones are specified in the configuration via pixel values - convert to percentages */
+    /**
+     * Zones are specified in the configuration via pixel values - convert to percentages.
+     * The server does this when it knows the size of the background image; this handles
+     * problems saved before it did.
+     */
     var computeZoneDimension = function(zone, bg_image_width, bg_image_height) {
         if (zone.x_percent === undefined) {
             // We can assume that if 'x_percent' is not set, 'y_percent', 'width_percent', and
@@ -489,13 +1021,12 @@ function DragAndDropBlock(runtime, element, configuration) {
         if (!$option.is('.option')) {
             return;
         }
-        var itemId = $option.data('value');
-        configuration.items.forEach(function(item) {
-            if (item.id == itemId) {
-                item.imgNaturalWidth = event.target.naturalWidth;
-            }
-        });
-        setTimeout(applyState, 0); // Apply changes to the DOM after the event handling completes.
+        var item = itemsById[$option.data('value')];
+        if (item && item.imgNaturalWidth !== event.target.naturalWidth) {
+            item.imgNaturalWidth = event.target.naturalWidth;
+            // When many images load at once, the DOM is still only updated once.
+            scheduleUpdate();
+        }
     };
 
 
@@ -525,12 +1056,41 @@ function DragAndDropBlock(runtime, element, configuration) {
             truncateField(data, 'content');
             publishEvent(data);
         }
+        // Any key press or click on the page closes the feedback popup. Pressing an item prevents
+        // the mouse events that would follow its pointerdown, so pointerdown closes it too (the
+        // popup is closed by whichever of them comes first):
+        pageEvents.toggle(
+            Boolean(state.feedback), element, document, 'keydown mousedown touchstart pointerdown', closePopup
+        );
 
-        updateDOM();
-        destroyDraggable();
-        if (!state.finished) {
-            initDraggable();
+        scheduleUpdate();
+    };
+
+    /**
+     * Updates of the DOM are coalesced: however many times the state changes before the next
+     * animation frame, the DOM is updated once, just before the frame is painted.
+     */
+    var requestFrame = window.requestAnimationFrame ?
+        function(callback) { return window.requestAnimationFrame(callback); } :
+        function(callback) { return setTimeout(callback, 16); };
+    var cancelFrame = window.cancelAnimationFrame ?
+        function(id) { window.cancelAnimationFrame(id); } :
+        function(id) { clearTimeout(id); };
+    var updateFrame = null;
+
+    var scheduleUpdate = function() {
+        if (updateFrame === null) {
+            updateFrame = requestFrame(flushUpdate);
+        }
+    };
+
+    /** Update the DOM now, if an update is scheduled or not. */
+    var flushUpdate = function() {
+        if (updateFrame !== null) {
+            cancelFrame(updateFrame);
+            updateFrame = null;
         }
+        updateDOM();
     };
 
     var updateDOM = function(state) {
@@ -542,13 +1102,60 @@ function DragAndDropBlock(runtime, element, configuration) {
     };
 
     var publishEvent = function(data) {
+        if (!configuration.batch_events) {
+            $.ajax({
+                type: 'POST',
+                url: runtime.handlerUrl(element, 'publish_event'),
+                data: JSON.stringify(data)
+            });
+            return;
+        }
+        eventQueue.push(data);
+        if (eventQueue.length === 1) {
+            // Don't lose queued events when the learner navigates away or switches tabs:
+            pageEvents.on(element, window, 'pagehide', flushEventsOnExit);
+            pageEvents.on(element, document, 'visibilitychange', flushEventsOnHide);
+        }
+        if (eventQueue.length >= EVENT_BATCH_SIZE) {
+            flushEvents();
+        } else if (eventFlushTimer === null) {
+            eventFlushTimer = setTimeout(flushEvents, EVENT_BATCH_DELAY);
+        }
+    };
+
+    /** Send all queued events to the server in a single request. */
+    var flushEvents = function(useBeacon) {
+        clearTimeout(eventFlushTimer);
+        eventFlushTimer = null;
+        if (eventQueue.length === 0) {
+            return;
+        }
+        var url = runtime.handlerUrl(element, 'publish_event');
+        var data = JSON.stringify(eventQueue);
+        eventQueue = [];
+        pageEvents.off(element, window, 'pagehide', flushEventsOnExit);
+        pageEvents.off(element, document, 'visibilitychange', flushEventsOnHide);
+        // sendBeacon requests survive the page being unloaded, unlike regular AJAX requests.
+        if (useBeacon && navigator.sendBeacon && navigator.sendBeacon(url, data)) {
+            return;
+        }
         $.ajax({
             type: 'POST',
-            url: runtime.handlerUrl(element, 'publish_event'),
-            data: JSON.stringify(data)
+            url: url,
+            data: data
         });
     };
 
+    var flushEventsOnExit = function() {
+        flushEvents(true);
+    };
+
+    var flushEventsOnHide = function() {
+        if (document.visibilityState === 'hidden') {
+            flushEventsOnExit();
+        }
+    };
+
     var isCycleKey = function(evt) {
         return !evt.ctrlKey && !evt.metaKey && evt.which === TAB;
     };
@@ -610,87 +1217,107 @@ function DragAndDropBlock(runtime, element, configuration) {
             y_percent: y_pos_percent,
             submitting_location: true,
         };
-        // Wrap in setTimeout to let the droppable event finish.
+        // Wrap in setTimeout to let the drop event finish.
         setTimeout(function() {
             applyState();
             submitLocation(item_id, zone, x_pos_percent, y_pos_percent);
         }, 0);
     };
 
+    // Items and zones are set up once, with events delegated to the block's element: whether an
+    // item can be dragged is read from its data-drag-disabled attribute when it is used, so
+    // nothing needs to be done for each item as the state changes.
+    var DRAGGABLE_ITEMS = '.item-bank .option[data-drag-disabled=false]';
+
     var initDroppable = function() {
         // Set up zones for keyboard interaction
-        $root.find('.zone').each(function() {
+        $element.on('keydown', '.target .zone', function(evt) {
             var $zone = $(this);
-            $zone.on('keydown', function(evt) {
-                if (placementMode) {
-                    if (isCycleKey(evt)) {
-                        focusNextZone(evt, $zone);
-                    } else if (isCancelKey(evt)) {
-                        evt.preventDefault();
-                        placementMode = false;
-                        releaseItem($selectedItem);
-                    } else if (isActionKey(evt)) {
-                        evt.preventDefault();
-                        placementMode = false;
-                        placeItem($zone);
-                        releaseItem($selectedItem);
-                    }
+            if (placementMode) {
+                if (isCycleKey(evt)) {
+                    focusNextZone(evt, $zone);
+                } else if (isCancelKey(evt)) {
+                    evt.preventDefault();
+                    placementMode = false;
+                    releaseItem($selectedItem);
+                } else if (isActionKey(evt)) {
+                    evt.preventDefault();
+                    placementMode = false;
+                    placeItem($zone);
+                    releaseItem($selectedItem);
                 }
-            });
-        });
-
-        // Make zone accept items that are dropped using the mouse
-        $root.find('.zone').droppable({
-            accept: '.item-bank .option',
-            tolerance: 'pointer',
-            drop: function(evt, ui) {
-                var $zone = $(this);
-                var $item = ui.helper;
-                placeItem($zone, $item);
             }
         });
     };
 
-    var initDraggable = function() {
-        $root.find('.item-bank .option').not('[data-drag-disabled=true]').each(function() {
-            var $item = $(this);
+    // Items are dragged using the mouse or touch with the drag engine, and dropped on zones.
+    // The zone under the pointer is found with the zone grid, from the position of the background
+    // image and the zone elements, which are looked up when each drag starts.
+    var zoneGrid;
+    var zoneIndexes = {};  // Position of each zone in configuration.zones, by UID
+    var targetImgRect;
+    var zoneElements;
+    var $hoveredZone = null;
+
+    var zoneAt = function(point) {
+        var x_percent = (point.x - targetImgRect.left) / targetImgRect.width * 100;
+        var y_percent = (point.y - targetImgRect.top) / targetImgRect.height * 100;
+        var zones = zoneGrid.zonesAt(x_percent, y_percent);
+        if (zones.length === 0) {
+            return null;
+        }
+        // Zones defined later are rendered on top of earlier ones.
+        return zoneElements[zoneIndexes[zones[zones.length - 1].uid]];
+    };
 
-            // Allow item to be "picked up" using the keyboard
-            $item.on('keydown', function(evt) {
-                if (isActionKey(evt)) {
-                    evt.preventDefault();
-                    placementMode = true;
-                    grabItem($item);
-                    $selectedItem = $item;
-                    $root.find('.target .zone').first().focus();
-                }
+    var dragEngine = DragNDropDragEngine({
+        container: function() { return $root.find('.drag-container')[0]; },
+        targetAt: zoneAt,
+        start: function($item) {
+            var $target_img = $root.find('.target-img');
+            var offset = $target_img.offset();
+            targetImgRect = {
+                left: offset.left, top: offset.top, width: $target_img.width(), height: $target_img.height()
+            };
+            zoneElements = $root.find('.target .zone').get();
+            grabItem($item);
+            publishEvent({
+                event_type: 'edx.drag_and_drop_v2.item.picked_up',
+                item_id: $item.data('value'),
             });
+        },
+        hover: function($zone) {
+            if ($hoveredZone) {
+                $hoveredZone.removeClass('drop-hover');
+            }
+            $hoveredZone = $zone;
+            if ($zone) {
+                $zone.addClass('drop-hover');
+            }
+        },
+        drop: function($zone, $item) {
+            placeItem($zone, $item);
+        },
+        stop: function($item) {
+            releaseItem($item);
+        }
+    });
 
-            // Make item draggable using the mouse
-            try {
-                $item.draggable({
-                    containment: $root.find('.drag-container'),
-                    cursor: 'move',
-                    stack: $root.find('.item-bank .option'),
-                    revert: 'invalid',
-                    revertDuration: 150,
-                    start: function(evt, ui) {
-                        var $item = $(this);
-                        grabItem($item);
-                        publishEvent({
-                            event_type: 'edx.drag_and_drop_v2.item.picked_up',
-                            item_id: $item.data('value'),
-                        });
-                    },
-                    stop: function(evt, ui) {
-                        releaseItem($(this));
-                    }
-                });
-            } catch (e) {
-                // Initializing the draggable will fail if draggable was already
-                // initialized. That's expected, ignore the exception.
+    var initDraggable = function() {
+        // Allow items to be "picked up" using the keyboard
+        $element.on('keydown', DRAGGABLE_ITEMS, function(evt) {
+            if (isActionKey(evt)) {
+                var $item = $(this);
+                evt.preventDefault();
+                placementMode = true;
+                grabItem($item);
+                $selectedItem = $item;
+                $root.find('.target .zone').first().focus();
             }
         });
+
+        // Make items draggable using the mouse or touch
+        dragEngine.bind($element, DRAGGABLE_ITEMS);
     };
 
     var grabItem = function($item) {
@@ -706,33 +1333,72 @@ function DragAndDropBlock(runtime, element, configuration) {
     };
 
     var setGrabbedState = function(item_id, grabbed) {
-        for (var i = 0; i < configuration.items.length; i++) {
-            if (configuration.items[i].id === item_id) {
-                configuration.items[i].grabbed = grabbed;
-            }
+        if (itemsById.hasOwnProperty(item_id)) {
+            itemsById[item_id].grabbed = grabbed;
         }
     };
 
-    var destroyDraggable = function() {
-        $root.find('.item-bank .option[data-drag-disabled=true]').each(function() {
-            var $item = $(this);
+    // Attempts (drops and numerical inputs) waiting to be sent to the server. Attempts made
+    // while a request is in flight (e.g. quick successive drops in keyboard mode) are
+    // coalesced and sent in a single 'do_attempts' request once it completes, at most
+    // MAX_BATCH_ATTEMPTS (the limit of the handler) at a time.
+    var MAX_BATCH_ATTEMPTS = 100;
+    var pendingAttempts = [];
+    var attemptInFlight = false;
 
-            $item.off();
+    var submitAttempt = function(data) {
+        var promise = $.Deferred();
+        pendingAttempts.push({data: data, promise: promise});
+        if (!attemptInFlight) {
+            flushAttempts();
+        }
+        return promise;
+    };
 
-            try {
-                $item.draggable('destroy');
-            } catch (e) {
-                // Destroying the draggable will fail if draggable was
-                // not initialized in the first place. Ignore the exception.
-            }
-        });
+    var flushAttempts = function() {
+        if (pendingAttempts.length === 0) {
+            return;
+        }
+        var batch = pendingAttempts.slice(0, MAX_BATCH_ATTEMPTS);
+        pendingAttempts = pendingAttempts.slice(MAX_BATCH_ATTEMPTS);
+        attemptInFlight = true;
+
+        var url, data;
+        if (batch.length === 1) {
+            url = runtime.handlerUrl(element, 'do_attempt');
+            data = batch[0].data;
+        } else {
+            url = runtime.handlerUrl(element, 'do_attempts');
+            data = batch.map(function(attempt) { return attempt.data; });
+        }
+        $.post(url, JSON.stringify(data), 'json')
+            .done(function(response) {
+                setStateVersion(response.state_version);
+                var results = (batch.length === 1) ? [response] : response.results;
+                batch.forEach(function(attempt, i) {
+                    // Attempts rejected by the server are reported individually in a batch:
+                    if (results[i].error !== undefined) {
+                        attempt.promise.reject(results[i]);
+                    } else {
+                        attempt.promise.resolve(results[i]);
+                    }
+                });
+            })
+            .fail(function() {
+                batch.forEach(function(attempt) {
+                    attempt.promise.reject();
+                });
+            })
+            .always(function() {
+                attemptInFlight = false;
+                flushAttempts();
+            });
     };
 
     var submitLocation = function(item_id, zone, x_percent, y_percent) {
         if (!zone) {
             return;
         }
-        var url = runtime.handlerUrl(element, 'do_attempt');
         var data = {
             val: item_id,
             zone: zone,
@@ -740,7 +1406,7 @@ function DragAndDropBlock(runtime, element, configuration) {
             y_percent: y_percent,
         };
 
-        $.post(url, JSON.stringify(data), 'json')
+        submitAttempt(data)
             .done(function(data){
                 state.last_action_correct = data.correct_location;
                 if (data.correct_location) {
@@ -778,9 +1444,8 @@ function DragAndDropBlock(runtime, element, configuration) {
         state.items[item_id].submitting_input = true;
         applyState();
 
-        var url = runtime.handlerUrl(element, 'do_attempt');
         var data = {val: item_id, input: input_value};
-        $.post(url, JSON.stringify(data), 'json')
+        submitAttempt(data)
             .done(function(data) {
                 state.last_action_correct = data.correct;
                 state.items[item_id].submitting_input = false;
@@ -832,6 +1497,8 @@ function DragAndDropBlock(runtime, element, configuration) {
             type: 'POST',
             url: runtime.handlerUrl(element, 'reset'),
             data: '{}',
+        }).done(function(data) {
+            setStateVersion(data.state_version);
         });
         state = {
             'items': [],
@@ -917,8 +1584,8 @@ function DragAndDropBlock(runtime, element, configuration) {
 
     /**
      * migrateConfiguration: Apply any changes to support older versions of the configuration.
-     * We have to do this in JS, not python, since some migrations depend on the image size,
-     * which is not known in Python-land.
+     * The server applies them when the problem is saved if it knows the size of the background
+     * image; this handles problems saved before it did.
      */
     var migrateConfiguration = function(bg_image_width) {
         for (var i in configuration.items) {
@@ -933,8 +1600,8 @@ function DragAndDropBlock(runtime, element, configuration) {
     /**
      * migrateState: Apply any changes necessary to support the 'state' format used by older
      * versions of this XBlock.
-     * We have to do this in JS, not python, since some migrations depend on the image size,
-     * which is not known in Python-land.
+     * The server migrates the state when it knows the size of the background image; this
+     * handles problems saved before it did.
      */
     var migrateState = function(bg_image_width, bg_image_height) {
         Object.keys(state.items).forEach(function(item_id) {
@@ -943,14 +1610,11 @@ function DragAndDropBlock(runtime, element, configuration) {
                 // Find the matching item in the configuration
                 var width = 190;
                 var height = 44;
-                for (var i in configuration.items) {
-                    if (configuration.items[i].id === +item_id) {
-                        var size = configuration.items[i].size;
-                        // size is an object like '{width: "50px", height: "auto"}'
-                        if (parseInt(size.width ) > 0) {  width = parseInt(size.width); }
-                        if (parseInt(size.height) > 0) { height = parseInt(size.height); }
-                        break;
-                    }
+                if (itemsById.hasOwnProperty(item_id)) {
+                    var size = itemsById[item_id].size;
+                    // size is an object like '{width: "50px", height: "auto"}'
+                    if (parseInt(size.width ) > 0) {  width = parseInt(size.width); }
+                    if (parseInt(size.height) > 0) { height = parseInt(size.height); }
                 }
                 // Update the user's item state to use centered relative coordinates
                 var left_px = parseFloat(item.left) - 220; // 220 px for the items container that used to be on the left
@@ -964,5 +1628,5 @@ function DragAndDropBlock(runtime, element, configuration) {
         });
     };
 
-    init();
+    hydrate();
 }
@@ -179,9 +179,9 @@ function DragAndDropEditBlock(runtime, element, params) {
                             if (new_img_url) {
                                 // We may need to 'expand' the URL before it will be valid.
                                 // e.g. '/static/blah.png' becomes '/asset-v1:course+id/blah.png'
-                                var handlerUrl = runtime.handlerUrl(element, 'expand_static_url');
-                                $.post(handlerUrl, JSON.stringify(new_img_url), function(result) {
-                                    _fn.build.$el.targetImage.attr('src', result.url);
+                                var handlerUrl = runtime.handlerUrl(element, 'expand_static_urls');
+                                $.post(handlerUrl, JSON.stringify([new_img_url]), function(result) {
+                                    _fn.build.$el.targetImage.attr('src', result.urls[0]);
                                 });
                             } else {
                                 new_img_url = params.default_background_image_url;
@@ -490,6 +490,17 @@ function DragAndDropEditBlock(runtime, element, params) {
                         _fn.data.items = items;
                         _fn.data.zones = _fn.build.form.zone.zoneObjects;
 
+                        // Send the natural size of the background image, so that the server can
+                        // convert the zones' pixel geometry to percentages once, at save time.
+                        var targetImage = _fn.build.$el.targetImage[0];
+                        if (targetImage.complete && targetImage.naturalWidth > 0) {
+                            _fn.data.targetImgWidth = targetImage.naturalWidth;
+                            _fn.data.targetImgHeight = targetImage.naturalHeight;
+                        } else {
+                            delete _fn.data.targetImgWidth;
+                            delete _fn.data.targetImgHeight;
+                        }
+
                         var data = {
                             'display_name': $element.find('#display-name').val(),
                             'show_title': $element.find('.show-title').is(':checked'),
@@ -508,8 +519,9 @@ function DragAndDropEditBlock(runtime, element, params) {
                             if (response.result === 'success') {
                                 window.location.reload(false);
                             } else {
+                                // The message may contain text entered by the author:
                                 $('.xblock-editor-error-message', element)
-                                    .html(gettext('Error: ') + response.message);
+                                    .text(gettext('Error: ') + response.message);
                                 $('.xblock-editor-error-message', element).css('display', 'block');
                             }
                         });
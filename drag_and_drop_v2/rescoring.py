@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Offline bulk rescoring of learners' answers to a drag and drop problem.
+
+After the definition of a problem has been fixed (e.g. an item's zone or an `inputOptions`
+margin), this computes the new grade of every learner from their saved item state, using the
+same scoring rules as the block's `do_attempt` handler. The work is spread over a process pool.
+
+It can be used from Python:
+
+    for user, grade, finished in rescore(problem_data, records, weight=1):
+        ...
+
+or from the command line, with the problem definition (the block's `data` field) in a JSON file
+and one JSON record per line, like {"user": "...", "item_state": {...}}:
+
+    python -m drag_and_drop_v2.rescoring problem.json states.ndjson > grades.ndjson
+"""
+
+# Imports ###########################################################
+
+import argparse
+import collections
+import itertools
+import json
+import multiprocessing
+import sys
+
+from .problem import CompiledProblem, progress_grade, progress_is_finished
+from .storage import decode_item_state
+
+
+# Globals ###########################################################
+
+# The problem being rescored, compiled once by each worker process.
+_worker_problem = None
+
+
+# Functions #########################################################
+
+def rescore_item_state(problem, item_state, weight=1):
+    """
+    Returns (grade, finished) for a learner whose `item_state` field holds `item_state`,
+    in any of the formats in which it may be stored, on the given CompiledProblem.
+    """
+    progress = problem.compute_progress(decode_item_state(item_state))
+    return progress_grade(progress, weight), progress_is_finished(progress)
+
+
+def rescore(data, records, weight=1, processes=None, chunksize=256):
+    """
+    Rescore learners on the problem defined by `data` (the block's `data` field).
+
+    `records` is an iterable of (user, item_state) pairs. Yields (user, grade, finished) for
+    each record, in the same order. `processes` is the size of the process pool (by default, the
+    number of CPUs); with processes=1 the records are rescored in the current process.
+
+    Records are sent to the pool in chunks of `chunksize`, and only read from `records` while
+    fewer than two chunks per process are waiting for their results, so a stream of any length
+    can be rescored in bounded memory.
+    """
+    if processes == 1:
+        problem = CompiledProblem(data)
+        for user, item_state in records:
+            grade, finished = rescore_item_state(problem, item_state, weight)
+            yield user, grade, finished
+        return
+
+    processes = processes or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(data,))
+    try:
+        pending = collections.deque()
+        records = iter(records)
+        while True:
+            chunk = list(itertools.islice(records, chunksize))
+            if chunk:
+                pending.append(pool.apply_async(_rescore_chunk, (chunk, weight)))
+            if pending and (not chunk or len(pending) >= 2 * processes):
+                for result in pending.popleft().get():
+                    yield result
+            elif not chunk:
+                break
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _init_worker(data):
+    global _worker_problem  # pylint: disable=global-statement
+    _worker_problem = CompiledProblem(data)
+
+
+def _rescore_chunk(records, weight):
+    results = []
+    for user, item_state in records:
+        grade, finished = rescore_item_state(_worker_problem, item_state, weight)
+        results.append((user, grade, finished))
+    return results
+
+
+def _read_records(lines):
+    for line in lines:
+        if line.strip():
+            record = json.loads(line)
+            yield record['user'], record['item_state']
+
+
+# Main ##############################################################
+
+def main(argv=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Rescore learners' answers to a drag and drop problem.")
+    parser.add_argument('problem', help="JSON file containing the problem definition")
+    parser.add_argument('states', help="file with one JSON record per line: {\"user\": ..., \"item_state\": ...}")
+    parser.add_argument('--weight', type=float, default=1, help="the problem's weight")
+    parser.add_argument('--processes', type=int, default=None, help="number of worker processes")
+    args = parser.parse_args(argv)
+
+    with open(args.problem) as problem_file:
+        data = json.load(problem_file)
+    with open(args.states) as states_file:
+        results = rescore(data, _read_records(states_file), args.weight, args.processes)
+        for user, grade, finished in results:
+            sys.stdout.write(json.dumps({'user': user, 'grade': grade, 'finished': finished}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Storage format of the learner's item state.
+
+The block works with item state in "dict form": a dict mapping each placed item's ID (as a
+string) to a dict like {'zone': ..., 'x_percent': ..., 'y_percent': ..., 'input': ...}.
+
+It is stored in a compact, versioned form instead, since there is one row of it per learner:
+
+    {"v": 2, "items": {"0": ["zone-1", 33.5, 11.2], "1": ["zone-2", 0.0, 85.1, "250"]}}
+
+Each item is a fixed-position array [zone, x_percent, y_percent] followed by the learner's
+numerical input, if any. Item state that does not fit this layout (e.g. pixel positions saved by
+old versions of this block) is stored as a dict.
+
+Older versions of the block stored the dict form itself (version 1, which has no "v" key),
+with some items stored as [top, left] pixel positions. Such state is read transparently, and
+upgraded to the compact form the next time the learner's state is saved.
+"""
+
+# Globals ###########################################################
+
+ITEM_STATE_VERSION = 2
+
+# Keys of the dict form of an item's state, in the order they are stored in the compact form.
+COMPACT_FIELDS = ('zone', 'x_percent', 'y_percent', 'input')
+
+
+# Functions #########################################################
+
+def decode_item_state(raw_state):
+    """
+    Convert item state as stored in the `item_state` field (in any version) into the dict form.
+    Always returns new dicts, so the result can safely be modified.
+    """
+    if raw_state.get('v') == ITEM_STATE_VERSION:
+        return {item_id: _decode_item(item) for item_id, item in raw_state['items'].iteritems()}
+
+    # Version 1: dict form, but items may be stored in legacy tuple form.
+    state = {}
+    for item_id, item in raw_state.iteritems():
+        if isinstance(item, dict):
+            state[item_id] = dict(item)
+        else:
+            state[item_id] = {'top': item[0], 'left': item[1]}
+    return state
+
+
+def encode_item_state(state):
+    """
+    Convert item state in dict form into the format in which it is stored.
+    """
+    return {
+        'v': ITEM_STATE_VERSION,
+        'items': {item_id: _encode_item(item) for item_id, item in state.iteritems()},
+    }
+
+
+def _decode_item(item):
+    if isinstance(item, dict):
+        return dict(item)
+    return dict(zip(COMPACT_FIELDS, item))
+
+
+def _encode_item(item):
+    fields = COMPACT_FIELDS if 'input' in item else COMPACT_FIELDS[:-1]
+    if set(item) != set(fields):
+        return dict(item)
+    return [item[field] for field in fields]
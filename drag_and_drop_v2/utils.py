@@ -1,7 +1,87 @@
 # -*- coding: utf-8 -*-
 #
 
+# Imports ###########################################################
+
+import threading
+import time
+from collections import OrderedDict
+
 
 # Make '_' a no-op so we can scrape strings
 def _(text):
     return text
+
+
+class LRUCache(object):
+    """
+    A small thread-safe, size-bounded mapping that evicts the least recently used entry.
+
+    Used for per-process caches of values derived from author content, which are shared by
+    all block instances (and therefore all learners) served by the same process.
+    If `ttl` is given, entries expire that many seconds after they were set.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """ Return the value cached for `key` (marking it as recently used), or `default`. """
+        with self._lock:
+            try:
+                value, expires = self._data.pop(key)
+            except KeyError:
+                return default
+            if expires is not None and expires <= time.time():
+                return default
+            self._data[key] = (value, expires)
+            return value
+
+    def set(self, key, value):
+        """ Cache `value` under `key`, evicting the oldest entries if the cache is full. """
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class StatsCounter(object):
+    """
+    Thread-safe named counters, for monitoring the block's behavior within a process.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def get(self, name):
+        return self._counts.get(name, 0)
+
+    def snapshot(self):
+        """ Return a copy of all counters. """
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
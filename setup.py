@@ -3,7 +3,11 @@
 # Imports ###########################################################
 
 import os
+import subprocess
+import sys
+
 from setuptools import setup
+from setuptools.command.build_py import build_py
 
 
 # Functions #########################################################
@@ -19,8 +23,27 @@ def package_data(pkg, root_list):
     return {pkg: data}
 
 
+# Classes ###########################################################
+
+class BuildPyWithBundles(build_py):
+    """Builds the asset bundles of the views before collecting the package files."""
+
+    def run(self):
+        # The package itself cannot be imported before its dependencies are installed, so the
+        # bundles module, which only needs the standard library, is run as a script.
+        subprocess.check_call([sys.executable, os.path.join('drag_and_drop_v2', 'bundles.py')])
+        build_py.run(self)
+
+
 # Main ##############################################################
 
+# The asset bundles are rebuilt, and previous builds removed, by build_py, after the package data
+# is listed here, so they are listed with a pattern, which is expanded when the files are copied.
+PACKAGE_DATA = [
+    path for path in package_data("drag_and_drop_v2", ["static", "templates", "public"])["drag_and_drop_v2"]
+    if not path.startswith("public/bundles/")
+] + ["public/bundles/*"]
+
 setup(
     name='xblock-drag-and-drop-v2',
     version='2.0.2',
@@ -35,5 +58,6 @@ setup(
     entry_points={
         'xblock.v1': 'drag-and-drop-v2 = drag_and_drop_v2:DragAndDropBlock',
     },
-    package_data=package_data("drag_and_drop_v2", ["static", "templates", "public"]),
+    package_data={"drag_and_drop_v2": PACKAGE_DATA},
+    cmdclass={'build_py': BuildPyWithBundles},
 )
@@ -0,0 +1,25 @@
+"""
+Benchmarks of the Drag and Drop V2 XBlock.
+
+The block and the workbench runtime import Django models, so Django is configured here (the same
+way as by run_tests.py, unless it already is) before the benchmark modules import them.
+"""
+
+# Imports ###########################################################
+
+import logging
+import os
+import sys
+
+import django
+from django.conf import settings
+import workbench
+
+
+# Main ##############################################################
+
+if not settings.configured:
+    sys.path.append(os.path.dirname(os.path.dirname(workbench.__file__)))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+    logging.disable(logging.DEBUG)
+    django.setup()
@@ -0,0 +1,338 @@
+"""
+Micro-benchmarks of the Drag and Drop V2 XBlock's views and handlers.
+
+Measures the latency of `do_attempt`, `get_user_state`, `get_configuration`, `student_view`
+and `studio_view` on the problems in tests/unit/data and on synthetic problems of increasing
+size, and their memory use:
+
+* the number of garbage-collected objects each call leaves alive (e.g. in caches);
+* the growth of the process's peak resident set size over all calls of a benchmark;
+* on Python 3.4+, where tracemalloc is available, the peak memory allocated by each call.
+
+Run it from the repository root, with the same environment as run_tests.py:
+
+    python -m tests.benchmarks.handlers                        # print results
+    python -m tests.benchmarks.handlers --save baseline.json   # ... and save them as a baseline
+    python -m tests.benchmarks.handlers --compare baseline.json
+
+With --compare, exits with a non-zero status if the median latency of any benchmark is more
+than --threshold (by default 25%) above the baseline.
+"""
+
+# Imports ###########################################################
+
+from __future__ import print_function
+
+import argparse
+import copy
+import gc
+import json
+import sys
+import timeit
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from xblockutils.resources import ResourceLoader
+
+from drag_and_drop_v2 import drag_and_drop_v2 as dnd, problem
+
+from ..utils import make_block, make_request, TestCaseMixin
+
+
+# Globals ###########################################################
+
+loader = ResourceLoader('tests.unit')
+
+FIXTURES = ('plain', 'html', 'old')
+
+# (number of items, number of zones) of the synthetic problems
+SYNTHETIC_SIZES = ((10, 3), (100, 20), (500, 100), (2000, 500))
+
+PERCENTILES = (50, 90, 99)
+
+
+# Functions #########################################################
+
+def fixture_problem(folder):
+    """ Returns (settings, data) of one of the problems in tests/unit/data """
+    settings = json.loads(loader.load_unicode('data/{}/settings.json'.format(folder)))
+    data = json.loads(loader.load_unicode('data/{}/data.json'.format(folder)))
+    return settings, data
+
+
+def synthetic_problem(item_count, zone_count):
+    """
+    Returns (settings, data) of a generated problem. Zones are laid out on a grid; every tenth
+    item is a decoy and every fifth item expects a numerical input.
+    """
+    columns = max(1, int(zone_count ** 0.5))
+    rows = (zone_count + columns - 1) // columns
+    zones = [
+        {
+            'uid': 'zone-{}'.format(index),
+            'title': 'Zone {}'.format(index),
+            'description': 'Description of zone {}'.format(index),
+            'x': (index % columns) * 800 // columns,
+            'y': (index // columns) * 600 // rows,
+            'width': 800 // columns,
+            'height': 600 // rows,
+        }
+        for index in range(zone_count)
+    ]
+    items = []
+    for index in range(item_count):
+        item = {
+            'id': index,
+            'displayName': 'Item {}'.format(index),
+            'imageURL': '',
+            'zone': 'none' if index % 10 == 9 else zones[index % zone_count]['uid'],
+            'feedback': {'correct': 'Correct!', 'incorrect': 'No, try again.'},
+        }
+        if index % 5 == 4:
+            item['inputOptions'] = {'value': index, 'margin': 1}
+        items.append(item)
+    settings = {
+        'display_name': 'Synthetic problem ({} items, {} zones)'.format(item_count, zone_count),
+        'show_title': True,
+        'question_text': 'Can you solve this drag-and-drop problem?',
+        'show_question_header': True,
+        'weight': 1,
+        'item_background_color': '',
+        'item_text_color': '',
+        'url_name': 'synthetic',
+    }
+    data = {
+        'zones': zones,
+        'items': items,
+        'feedback': {'start': 'Intro feedback', 'finish': 'Final feedback'},
+        'targetImg': '',
+        'targetImgDescription': 'A grid of zones',
+        'displayLabels': False,
+    }
+    return settings, data
+
+
+def scenarios():
+    """ Yields (name, settings, data) for each problem to benchmark """
+    for folder in FIXTURES:
+        settings, data = fixture_problem(folder)
+        yield 'fixture-{}'.format(folder), settings, data
+    for item_count, zone_count in SYNTHETIC_SIZES:
+        settings, data = synthetic_problem(item_count, zone_count)
+        yield 'synthetic-{}x{}'.format(item_count, zone_count), settings, data
+
+
+def make_problem_block(settings, data):
+    """ Instantiate a block with the given settings and problem definition """
+    block = make_block()
+    for field, value in settings.items():
+        setattr(block, field, value)
+    block.data = copy.deepcopy(data)
+    return block
+
+
+def clear_caches():
+    """ Forget the compiled problems and configurations shared by all blocks in the process """
+    dnd._configuration_cache.clear()  # pylint: disable=protected-access
+    problem._compiled_problems.clear()  # pylint: disable=protected-access
+
+
+def peak_rss_kb():
+    """ Returns the peak resident set size of the process in kilobytes, or None if unknown """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # Bytes on macOS, kilobytes elsewhere
+
+
+def summarize(timings, allocations, objects, rss_growth_kb):
+    """ Returns the latency distribution (in milliseconds) and the memory use of a benchmark """
+    timings = sorted(timings)
+    result = {
+        'calls': len(timings),
+        'min_ms': timings[0] * 1000,
+        'max_ms': timings[-1] * 1000,
+        'mean_ms': sum(timings) / len(timings) * 1000,
+    }
+    for percentile in PERCENTILES:
+        index = min(len(timings) - 1, len(timings) * percentile // 100)
+        result['p{}_ms'.format(percentile)] = timings[index] * 1000
+    result['alloc_bytes'] = sum(allocations) // len(allocations) if allocations else None
+    result['objects'] = sum(objects) // len(objects)
+    result['rss_growth_kb'] = rss_growth_kb
+    return result
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns a list of (benchmark name, baseline median, current median) for the benchmarks whose
+    median latency is more than `threshold` (a fraction) above the baseline.
+    """
+    regressions = []
+    for name, stats in sorted(results.items()):
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['p50_ms'], stats['p50_ms']
+        if after > before * (1 + threshold):
+            regressions.append((name, before, after))
+    return regressions
+
+
+def format_results(results, baseline=None):
+    lines = ['{:<50} {:>6} {:>10} {:>10} {:>10} {:>8} {:>8} {:>12} {:>9}'.format(
+        'benchmark', 'calls', 'p50 ms', 'p90 ms', 'p99 ms', 'objects', 'rss KB', 'alloc bytes', 'vs base'
+    )]
+    for name, stats in sorted(results.items()):
+        change = ''
+        if baseline and name in baseline and baseline[name]['p50_ms']:
+            change = '{:+.1%}'.format(stats['p50_ms'] / baseline[name]['p50_ms'] - 1)
+        alloc, rss = stats['alloc_bytes'], stats['rss_growth_kb']
+        lines.append('{:<50} {:>6} {:>10.3f} {:>10.3f} {:>10.3f} {:>8} {:>8} {:>12} {:>9}'.format(
+            name, stats['calls'], stats['p50_ms'], stats['p90_ms'], stats['p99_ms'], stats['objects'],
+            'n/a' if rss is None else rss, 'n/a' if alloc is None else alloc, change
+        ))
+    return '\n'.join(lines)
+
+
+# Classes ###########################################################
+
+class HandlerBenchmarks(TestCaseMixin):
+    """
+    Runs each benchmark on a fresh block, in the same workbench runtime as the unit tests.
+    """
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.block = None
+        self._cleanups = []
+
+    def addCleanup(self, function, *args, **kwargs):  # pylint: disable=invalid-name
+        self._cleanups.append((function, args, kwargs))
+
+    def cleanup(self):
+        while self._cleanups:
+            function, args, kwargs = self._cleanups.pop()
+            function(*args, **kwargs)
+
+    def handle(self, handler_name, data=None, method='POST'):
+        response = self.block.handle(handler_name, make_request(data, method=method))
+        assert response.status_code in (200, 304), response.body
+        return response
+
+    def measure(self, function, before=None):
+        """
+        Call `function` `repeat` times (after calling `before`, if given, untimed) and return the
+        summary of its latency and memory use.
+
+        The garbage collector is disabled during each call, after a collection, so that its
+        allocation counter gives the number of objects the call created and did not free.
+        """
+        timings, allocations, objects = [], [], []
+        rss_before = peak_rss_kb()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(self.repeat):
+                if before:
+                    before()
+                gc.collect()
+                objects_before = gc.get_count()[0]
+                if tracemalloc:
+                    tracemalloc.start()
+                start = timeit.default_timer()
+                function()
+                timings.append(timeit.default_timer() - start)
+                objects.append(gc.get_count()[0] - objects_before)
+                if tracemalloc:
+                    allocations.append(tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        rss_growth_kb = None if rss_before is None else peak_rss_kb() - rss_before
+        return summarize(timings, allocations, objects, rss_growth_kb)
+
+    def benchmarks(self, data):
+        """
+        Returns (operation, function, before) for each benchmark of the current block, whose
+        problem definition is `data`. `before` prepares each call, untimed.
+        """
+        attempts = [
+            {'val': item['id'], 'zone': item['zone'], 'x_percent': '10%', 'y_percent': '10%'}
+            for item in data['items'] if item['zone'] != 'none'
+        ]
+        attempts_left = []
+
+        def next_attempt():
+            # Start again from an empty state once every item has been placed.
+            if not attempts_left:
+                self.handle('reset', {})
+                attempts_left.extend(reversed(attempts))
+
+        return [
+            ('do_attempt', lambda: self.handle('do_attempt', attempts_left.pop()), next_attempt),
+            ('get_user_state', lambda: self.handle('get_user_state', method='GET'), None),
+            ('get_configuration', self.block.get_configuration, None),
+            ('get_configuration (cold)', self.block.get_configuration, clear_caches),
+            ('student_view', lambda: self.block.student_view({}), None),
+            ('studio_view', lambda: self.block.studio_view({}), None),
+        ]
+
+    def run(self, selected=None):
+        """ Runs all benchmarks (or those whose name contains `selected`) and returns the results """
+        self.patch_workbench()
+        results = {}
+        try:
+            for scenario, settings, data in scenarios():
+                self.block = make_problem_block(settings, data)
+                for operation, function, before in self.benchmarks(data):
+                    name = '{} {}'.format(scenario, operation)
+                    if not selected or selected in name:
+                        results[name] = self.measure(function, before)
+        finally:
+            self.cleanup()
+        return results
+
+
+# Main ##############################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Drag and Drop V2 XBlock's views and handlers.")
+    parser.add_argument('--repeat', type=int, default=50, help="number of calls per benchmark")
+    parser.add_argument('--only', help="run only the benchmarks whose name contains this string")
+    parser.add_argument('--save', metavar='FILE', help="save the results as a baseline")
+    parser.add_argument('--compare', metavar='FILE', help="compare the results with a saved baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="relative slowdown of the median latency reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = HandlerBenchmarks(args.repeat).run(args.only)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print(format_results(results, baseline))
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print('REGRESSION: {}: median {:.3f} ms -> {:.3f} ms'.format(name, before, after))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
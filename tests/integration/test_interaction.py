@@ -152,7 +152,7 @@ class InteractionTestBase(object):
         self.wait_until_visible(item)
         item_content = item.find_element_by_css_selector('.item-content')
 
-        self.assertEqual(item.get_attribute('class'), 'option ui-draggable')
+        self.assertEqual(item.get_attribute('class'), 'option')
         self.assertEqual(item.get_attribute('tabindex'), '0')
         self.assertEqual(item.get_attribute('draggable'), 'true')
         self.assertEqual(item.get_attribute('aria-grabbed'), 'false')
@@ -5,6 +5,8 @@ import unittest
 
 from xblockutils.resources import ResourceLoader
 
+from drag_and_drop_v2.drag_and_drop_v2 import publish_stats
+
 from ..utils import make_block, TestCaseMixin
 
 
@@ -66,7 +68,8 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             "finished": False,
             "correct": False,
             "correct_location": False,
-            "feedback": self.FEEDBACK[item_id]["incorrect"]
+            "feedback": self.FEEDBACK[item_id]["incorrect"],
+            "state_version": 1,
         })
 
     def test_do_attempt_wrong_without_feedback(self):
@@ -78,7 +81,8 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             "finished": False,
             "correct": False,
             "correct_location": False,
-            "feedback": self.FEEDBACK[item_id]["incorrect"]
+            "feedback": self.FEEDBACK[item_id]["incorrect"],
+            "state_version": 1,
         })
 
     def test_do_attempt_correct(self):
@@ -90,7 +94,8 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             "finished": False,
             "correct": True,
             "correct_location": True,
-            "feedback": self.FEEDBACK[item_id]["correct"]
+            "feedback": self.FEEDBACK[item_id]["correct"],
+            "state_version": 1,
         })
 
     def test_do_attempt_with_input(self):
@@ -103,6 +108,7 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             "correct_location": True,
             "feedback": None,
             "overall_feedback": None,
+            "state_version": 1,
         })
 
         expected_state = {
@@ -113,6 +119,7 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             },
             'finished': False,
             'overall_feedback': self.initial_feedback(),
+            'state_version': 1,
         }
         self.assertEqual(expected_state, self.call_handler('get_user_state', method="GET"))
 
@@ -124,7 +131,8 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             "correct": False,
             "correct_location": True,
             "feedback": self.FEEDBACK[1]['incorrect'],
-            "overall_feedback": None
+            "overall_feedback": None,
+            "state_version": 2,
         })
 
         expected_state = {
@@ -136,6 +144,7 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             },
             'finished': False,
             'overall_feedback': self.initial_feedback(),
+            'state_version': 2,
         }
         self.assertEqual(expected_state, self.call_handler('get_user_state', method="GET"))
 
@@ -148,6 +157,7 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             "correct_location": True,
             "feedback": self.FEEDBACK[1]['correct'],
             "overall_feedback": None,
+            "state_version": 3,
         })
 
         expected_state = {
@@ -159,6 +169,7 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             },
             'finished': False,
             'overall_feedback': self.initial_feedback(),
+            'state_version': 3,
         }
         self.assertEqual(expected_state, self.call_handler('get_user_state', method="GET"))
 
@@ -177,18 +188,133 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
         self.assertEqual(1, len(published_grades))
         self.assertEqual({'value': 0.5, 'max_value': 1}, published_grades[-1])
 
+        # The grade does not change, so it is not published again:
+        suppressed = publish_stats.get('grade_suppressed')
         self.call_handler('do_attempt', {
             "val": 1, "zone": self.ZONE_2, "y_percent": "90%", "x_percent": "42%"
         })
 
-        self.assertEqual(2, len(published_grades))
-        self.assertEqual({'value': 0.5, 'max_value': 1}, published_grades[-1])
+        self.assertEqual(1, len(published_grades))
+        self.assertEqual(suppressed + 1, publish_stats.get('grade_suppressed'))
 
         self.call_handler('do_attempt', {"val": 1, "input": "99"})
 
-        self.assertEqual(3, len(published_grades))
+        self.assertEqual(2, len(published_grades))
         self.assertEqual({'value': 1, 'max_value': 1}, published_grades[-1])
 
+    def test_grading_always_publish(self):
+        published_grades = []
+
+        def mock_publish(self, event, params):
+            if event == 'grade':
+                published_grades.append(params)
+        self.block.runtime.publish = mock_publish
+        self.block.get_xblock_settings = lambda default: {'always_publish_grade': True}
+
+        self.call_handler('do_attempt', {
+            "val": 0, "zone": self.ZONE_1, "y_percent": "11%", "x_percent": "33%"
+        })
+        self.call_handler('do_attempt', {
+            "val": 1, "zone": self.ZONE_2, "y_percent": "90%", "x_percent": "42%"
+        })
+
+        self.assertEqual(published_grades, [{'value': 0.5, 'max_value': 1}] * 2)
+
+    def test_do_attempts_batch(self):
+        published_grades = []
+
+        def mock_publish(self, event, params):
+            if event == 'grade':
+                published_grades.append(params)
+        self.block.runtime.publish = mock_publish
+
+        res = self.call_handler('do_attempts', [
+            {"val": 0, "zone": self.ZONE_1, "x_percent": "33%", "y_percent": "11%"},
+            {"val": 2, "zone": self.ZONE_1, "x_percent": "33%", "y_percent": "11%"},
+            {"val": 1, "zone": self.ZONE_2, "x_percent": "22%", "y_percent": "22%"},
+            {"val": 1, "input": "99"},
+        ])
+        self.assertEqual(res, {'results': [
+            {
+                "overall_feedback": None, "finished": False, "correct": True, "correct_location": True,
+                "feedback": self.FEEDBACK[0]["correct"],
+            },
+            {
+                "overall_feedback": None, "finished": False, "correct": False, "correct_location": False,
+                "feedback": self.FEEDBACK[2]["incorrect"],
+            },
+            {
+                "overall_feedback": None, "finished": False, "correct": False, "correct_location": True,
+                "feedback": None,
+            },
+            {
+                "overall_feedback": self.FINAL_FEEDBACK, "finished": True, "correct": True,
+                "correct_location": True, "feedback": self.FEEDBACK[1]["correct"],
+            },
+        ], 'state_version': 1})
+        self.assertEqual(published_grades, [{'value': 1, 'max_value': 1}])
+        self.assertTrue(self.block.completed)
+        self.assertEqual(self.call_handler('get_user_state', method="GET")["items"], {
+            "0": {"x_percent": "33%", "y_percent": "11%", "correct_input": True, "zone": self.ZONE_1},
+            "1": {"x_percent": "22%", "y_percent": "22%", "correct_input": True, "zone": self.ZONE_2, "input": "99"},
+        })
+
+    def test_do_attempts_invalid(self):
+        res = self.call_handler('do_attempts', {"val": 0}, expect_json=False)
+        self.assertEqual(res.status_code, 400)
+        res = self.call_handler('do_attempts', [{"val": 1, "input": "1"}] * 101, expect_json=False)
+        self.assertEqual(res.status_code, 400)
+
+    def test_do_attempts_invalid_attempt(self):
+        res = self.call_handler('do_attempts', [
+            "not an attempt",
+            {"val": 0, "zone": self.ZONE_1, "x_percent": "33%", "y_percent": "11%"},
+            {"val": 42, "zone": self.ZONE_1, "x_percent": "33%", "y_percent": "11%"},
+            {"val": 1, "zone": "no such zone", "x_percent": "33%", "y_percent": "11%"},
+        ])
+        # Invalid attempts are reported individually, and don't prevent valid ones from being saved:
+        self.assertEqual([result.get('error') for result in res['results']], [
+            "Expected an attempt object.", None, "Item not found.", "Item zone data invalid."
+        ])
+        self.assertTrue(res['results'][1]['correct'])
+        self.assertEqual(res['state_version'], 1)
+        self.assertEqual(list(self.call_handler('get_user_state')['items']), ["0"])
+
+        res = self.call_handler('do_attempts', [{"val": 42, "zone": self.ZONE_1}])
+        self.assertEqual(res, {'results': [{'error': "Item not found."}], 'state_version': 1})
+
+    def test_do_attempts_malformed_attempt(self):
+        res = self.call_handler('do_attempts', [
+            {"val": 0, "zone": self.ZONE_1, "x_percent": "33%", "y_percent": "11%"},
+            {"val": 1},
+            {"val": 1, "zone": self.ZONE_2},
+            {"val": 1, "zone": self.ZONE_2, "x_percent": ["33%"], "y_percent": "11%"},
+            {"val": 1, "zone": ["not", "a", "zone"], "x_percent": "33%", "y_percent": "11%"},
+        ])
+        self.assertEqual([result.get('error') for result in res['results']], [
+            None, "Item position invalid.", "Item position invalid.", "Item position invalid.",
+            "Item zone data invalid.",
+        ])
+        self.assertEqual(list(self.call_handler('get_user_state')['items']), ["0"])
+
+        res = self.call_handler('do_attempts', [{"val": 0, "zone": self.ZONE_1}])
+        self.assertEqual(res['results'], [{'error': "Item position invalid."}])
+
+    def test_rejected_attempt_leaves_state_untouched(self):
+        self.call_handler('do_attempt', {"val": 0, "zone": self.ZONE_1, "x_percent": "33%", "y_percent": "11%"})
+        item_state, progress = self.block.item_state, self.block.progress
+        res = self.call_handler('do_attempts', [
+            {"val": 0, "zone": "no such zone", "x_percent": "33%", "y_percent": "11%"},
+            {"val": 0, "input": {"not": "a value"}},
+        ])
+        self.assertEqual([result.get('error') for result in res['results']], [
+            "Item zone data invalid.", "Input value invalid."
+        ])
+        self.assertEqual(self.block.item_state, item_state)
+        self.assertEqual(self.block.progress, progress)
+        res = self.call_handler('do_attempt', {"val": 0, "zone": "no such zone"}, expect_json=False)
+        self.assertEqual(res.status_code, 400)
+
     def test_do_attempt_final(self):
         data = {"val": 0, "zone": self.ZONE_1, "x_percent": "33%", "y_percent": "11%"}
         self.call_handler('do_attempt', data)
@@ -199,6 +325,7 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             },
             "finished": False,
             'overall_feedback': self.initial_feedback(),
+            'state_version': 1,
         }
         self.assertEqual(expected_state, self.call_handler('get_user_state', method="GET"))
 
@@ -211,7 +338,8 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             "finished": True,
             "correct": True,
             "correct_location": True,
-            "feedback": self.FEEDBACK[1]["correct"]
+            "feedback": self.FEEDBACK[1]["correct"],
+            "state_version": 3,
         })
 
         expected_state = {
@@ -226,6 +354,7 @@ class BaseDragAndDropAjaxFixture(TestCaseMixin):
             },
             "finished": True,
             'overall_feedback': self.FINAL_FEEDBACK,
+            'state_version': 3,
         }
         self.assertEqual(expected_state, self.call_handler('get_user_state', method="GET"))
 
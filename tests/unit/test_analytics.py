@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from drag_and_drop_v2.analytics import aggregate, aggregate_file
+
+PROBLEM = 'block-v1:DnD+DnD+DnD+type@drag-and-drop-v2+block@1'
+OTHER_PROBLEM = 'block-v1:DnD+DnD+DnD+type@drag-and-drop-v2+block@2'
+
+
+def make_line(time, user, item_id, location_id, is_correct_location, input_value=None, is_correct=True,
+              usage_key=PROBLEM):
+    event = {
+        'username': 'user{}'.format(user),
+        'event_type': 'edx.drag_and_drop_v2.item.dropped',
+        'event_source': 'server',
+        'time': '2016-01-13T01:52:{:02d}.000000+00:00'.format(time),
+        'event': {
+            'item_id': item_id,
+            'location': location_id.title(),
+            'location_id': location_id,
+            'input': input_value,
+            'is_correct_location': is_correct_location,
+            'is_correct': is_correct,
+        },
+        'context': {'user_id': user, 'module': {'usage_key': usage_key}},
+    }
+    return json.dumps(event) + '\n'
+
+
+LOG_LINES = [
+    json.dumps({'event_type': 'edx.drag_and_drop_v2.loaded', 'event': {}}) + '\n',
+    make_line(3, 1, 0, 'top', True),
+    make_line(1, 1, 0, 'middle', False),  # Logged out of order: this is user 1's first attempt
+    make_line(2, 2, 0, 'top', True),
+    make_line(4, 2, 1, 'middle', True),
+    make_line(5, 2, 1, 'middle', True, input_value='12.5', is_correct=False),
+    make_line(6, 2, 1, 'middle', True, input_value='9', is_correct=True),
+    'not json\n',
+    make_line(7, 3, 0, 'bottom', False, usage_key=OTHER_PROBLEM),
+]
+
+PROBLEMS = {PROBLEM: {'items': [{'id': 0, 'zone': 'top'}, {'id': 1, 'zone': 'middle', 'inputOptions': {
+    'value': 10, 'margin': 1,
+}}], 'zones': []}}
+
+EXPECTED = {
+    PROBLEM: {
+        'confusion': {0: {'top': 2, 'middle': 1}, 1: {'middle': 1}},
+        'first_attempts': {0: {'learners': 2, 'correct': 1}, 1: {'learners': 1, 'correct': 1}},
+        'inputs': {1: {'submitted': 2, 'correct': 1, 'errors': {'-1.0': 1, '2.0': 1}}},
+    },
+    OTHER_PROBLEM: {
+        'confusion': {0: {'bottom': 1}},
+        'first_attempts': {0: {'learners': 1, 'correct': 0}},
+        'inputs': {},
+    },
+}
+
+
+class AnalyticsTests(unittest.TestCase):
+    """ Tests for the aggregation of item.dropped tracking log events """
+
+    def test_aggregate(self):
+        self.assertEqual(aggregate(LOG_LINES, PROBLEMS).to_dict(), EXPECTED)
+
+    def test_without_problem_definitions(self):
+        result = aggregate(LOG_LINES).to_dict()
+        self.assertEqual(result[PROBLEM]['inputs'], {1: {'submitted': 2, 'correct': 1, 'errors': {}}})
+
+    def test_aggregate_file_sharded(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'tracking.log')
+        with open(path, 'w') as log_file:
+            log_file.writelines(LOG_LINES)
+
+        # Every line is counted exactly once, wherever the byte ranges fall:
+        for processes in (1, 2, 3, 7, 50):
+            self.assertEqual(aggregate_file(path, PROBLEMS, processes=processes).to_dict(), EXPECTED)
+
+    def test_partitions(self):
+        # Each learner's drops are spilled to a single partition, however many there are:
+        for partitions in (1, 2, 5):
+            self.assertEqual(aggregate(LOG_LINES, PROBLEMS, partitions=partitions).to_dict(), EXPECTED)
@@ -1,10 +1,16 @@
+import json
 import unittest
 
+from mock import patch
+
 from drag_and_drop_v2.default_data import (
     TARGET_IMG_DESCRIPTION, TOP_ZONE_ID, MIDDLE_ZONE_ID, BOTTOM_ZONE_ID,
     START_FEEDBACK, FINISH_FEEDBACK, DEFAULT_DATA
 )
-from ..utils import make_block, TestCaseMixin
+from drag_and_drop_v2.drag_and_drop_v2 import DragAndDropBlock
+from drag_and_drop_v2.problem import compile_definition, fingerprint
+
+from ..utils import make_block, make_request, TestCaseMixin
 
 
 class BasicTests(TestCaseMixin, unittest.TestCase):
@@ -20,6 +26,25 @@ class BasicTests(TestCaseMixin, unittest.TestCase):
         self.assertIn('<section class="themed-xblock xblock--drag-and-drop">', student_fragment.content)
         self.assertIn('Loading drag and drop problem.', student_fragment.content)
 
+    def test_student_view_embeds_user_state(self):
+        data = {"val": 0, "zone": TOP_ZONE_ID, "x_percent": "33%", "y_percent": "11%"}
+        self.call_handler('do_attempt', data)
+        student_fragment = self.block.student_view({})
+        self.assertEqual(student_fragment.json_init_args["user_state"], self.call_handler("get_user_state"))
+        self.assertEqual(student_fragment.json_init_args["user_state"]["state_version"], 1)
+
+    def test_lazy_hydration(self):
+        student_fragment = self.block.student_view({})
+        self.assertFalse(student_fragment.json_init_args["lazy_hydration"])
+        self.assertNotIn('lazy-placeholder', student_fragment.content)
+
+        self.block.get_xblock_settings = lambda default: {'lazy_hydration': True}
+        student_fragment = self.block.student_view({})
+        self.assertTrue(student_fragment.json_init_args["lazy_hydration"])
+        # The placeholder has the size of the default background image, 514x486 pixels:
+        self.assertIn('style="max-width: 514px;"', student_fragment.content)
+        self.assertIn('style="padding-bottom: 94.5525%;"', student_fragment.content)
+
     def test_get_configuration(self):
         """
         Test the get_configuration() method.
@@ -37,6 +62,8 @@ class BasicTests(TestCaseMixin, unittest.TestCase):
             "show_problem_header": True,
             "target_img_expanded_url": '/expanded/url/to/drag_and_drop_v2/public/img/triangle.png',
             "target_img_description": TARGET_IMG_DESCRIPTION,
+            "target_img_width": 514,
+            "target_img_height": 486,
             "item_background_color": None,
             "item_text_color": None,
             "initial_feedback": START_FEEDBACK,
@@ -51,16 +78,50 @@ class BasicTests(TestCaseMixin, unittest.TestCase):
             {"id": 3, "displayName": "I don't belong anywhere", "imageURL": "", "inputOptions": False},
         ])
 
+    def test_get_configuration_cached(self):
+        config = self.block.get_configuration()
+        cached_config = self.block.get_configuration()
+        self.assertEqual(config, cached_config)
+        self.assertIs(config["items"], cached_config["items"])
+
+        # Changing settings or content invalidates the cached configuration:
+        self.block.display_name = "New title"
+        self.assertEqual(self.block.get_configuration()["title"], "New title")
+        self.block.data = dict(DEFAULT_DATA, items=DEFAULT_DATA['items'][:1])
+        self.assertEqual(len(self.block.get_configuration()["items"]), 1)
+
+    def test_problem_fingerprinted_once_per_data(self):
+        fingerprint_mock = self.apply_patch('drag_and_drop_v2.problem.fingerprint', wraps=fingerprint)
+        self.call_handler('get_user_state')
+        self.call_handler('do_attempt', {"val": 0, "zone": TOP_ZONE_ID, "x_percent": "33%", "y_percent": "11%"})
+        self.assertEqual(fingerprint_mock.call_count, 1)
+        # Replacing the content is picked up:
+        self.block.data = dict(DEFAULT_DATA, items=DEFAULT_DATA['items'][:1])
+        self.call_handler('get_user_state')
+        self.assertEqual(fingerprint_mock.call_count, 2)
+
+    def test_get_configuration_expands_urls_per_call(self):
+        self.assertEqual(
+            self.block.get_configuration()["target_img_expanded_url"],
+            '/expanded/url/to/drag_and_drop_v2/public/img/triangle.png',
+        )
+        # The cached configuration does not keep URLs that depend on the runtime:
+        self.block.runtime.local_resource_url = lambda block, path: '/other/runtime/' + path
+        self.assertEqual(
+            self.block.get_configuration()["target_img_expanded_url"], '/other/runtime/public/img/triangle.png'
+        )
+
     def test_ajax_solve_and_reset(self):
         # Check assumptions / initial conditions:
         self.assertFalse(self.block.completed)
 
         def assert_user_state_empty():
-            self.assertEqual(self.block.item_state, {})
+            self.assertEqual(self.block._get_item_state(), {})  # pylint: disable=protected-access
             self.assertEqual(self.call_handler("get_user_state"), {
                 'items': {},
                 'finished': False,
                 'overall_feedback': START_FEEDBACK,
+                'state_version': self.block.state_version,
             })
         assert_user_state_empty()
 
@@ -74,11 +135,11 @@ class BasicTests(TestCaseMixin, unittest.TestCase):
 
         # Check the result:
         self.assertTrue(self.block.completed)
-        self.assertEqual(self.block.item_state, {
-            '0': {'x_percent': '33%', 'y_percent': '11%', 'zone': TOP_ZONE_ID},
-            '1': {'x_percent': '67%', 'y_percent': '80%', 'zone': MIDDLE_ZONE_ID},
-            '2': {'x_percent': '99%', 'y_percent': '95%', 'zone': BOTTOM_ZONE_ID},
-        })
+        self.assertEqual(self.block.item_state, {'v': 2, 'items': {
+            '0': [TOP_ZONE_ID, '33%', '11%'],
+            '1': [MIDDLE_ZONE_ID, '67%', '80%'],
+            '2': [BOTTOM_ZONE_ID, '99%', '95%'],
+        }})
         self.assertEqual(self.call_handler('get_user_state'), {
             'items': {
                 '0': {'x_percent': '33%', 'y_percent': '11%', 'correct_input': True, 'zone': TOP_ZONE_ID},
@@ -87,13 +148,98 @@ class BasicTests(TestCaseMixin, unittest.TestCase):
             },
             'finished': True,
             'overall_feedback': FINISH_FEEDBACK,
+            'state_version': 3,
         })
 
         # Reset to initial conditions
         self.call_handler('reset', {})
         self.assertTrue(self.block.completed)
+        self.assertEqual(self.block.state_version, 4)
         assert_user_state_empty()
 
+    def test_progress_counters(self):
+        problem = self.block._get_problem()  # pylint: disable=protected-access
+        data = {"val": 0, "zone": TOP_ZONE_ID, "x_percent": "33%", "y_percent": "11%"}
+        self.call_handler('do_attempt', data)
+        data = {"val": 1, "zone": TOP_ZONE_ID, "x_percent": "67%", "y_percent": "80%"}
+        self.call_handler('do_attempt', data)
+        self.assertEqual(self.block.progress, {
+            'problem': problem.fingerprint, 'total': 3, 'placed': 1, 'pending_input': 0, 'correct': 1,
+        })
+
+        # When the problem definition changes, the counters are recomputed from the item state,
+        # but only stored when the state is saved:
+        self.block.data = dict(DEFAULT_DATA, items=DEFAULT_DATA['items'][:1])
+        self.assertTrue(self.block._is_finished())  # pylint: disable=protected-access
+        self.call_handler('get_user_state')
+        self.assertEqual(self.block.progress['total'], 3)
+        self.call_handler('do_attempt', {"val": 0, "zone": TOP_ZONE_ID, "x_percent": "30%", "y_percent": "10%"})
+        self.assertEqual(self.block.progress['total'], 1)
+        self.assertEqual(self.block.progress['placed'], 1)
+
+        self.call_handler('reset', {})
+        self.assertEqual(self.block.progress['placed'], 0)
+        self.assertFalse(self.block._is_finished())  # pylint: disable=protected-access
+
+    def test_get_user_state_conditional_request(self):
+        response = self.call_handler('get_user_state', method='GET', expect_json=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'], 'private, no-cache')
+        etag = response.headers['ETag']
+
+        request = make_request(None, method='GET')
+        request.headers['If-None-Match'] = etag
+        response = self.block.handle('get_user_state', request)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.body, '')
+
+        # The entity tag changes with the learner's state:
+        data = {"val": 0, "zone": TOP_ZONE_ID, "x_percent": "33%", "y_percent": "11%"}
+        self.call_handler('do_attempt', data)
+        response = self.block.handle('get_user_state', request)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(json.loads(response.body)['items'].keys(), ['0'])
+
+    def test_get_user_state_etag_after_state_reset(self):
+        data = {"val": 0, "zone": TOP_ZONE_ID, "x_percent": "33%", "y_percent": "11%"}
+        self.call_handler('do_attempt', data)
+        etag = self.call_handler('get_user_state', method='GET', expect_json=False).headers['ETag']
+
+        # An instructor resetting the learner's state clears all of its fields, so state_version
+        # starts over, and reaches the same value with a different state:
+        for field_name in ('item_state', 'completed', 'progress', 'last_published_grade', 'state_version'):
+            delattr(self.block, field_name)
+        data = {"val": 1, "zone": MIDDLE_ZONE_ID, "x_percent": "67%", "y_percent": "80%"}
+        self.call_handler('do_attempt', data)
+        self.assertEqual(self.block.state_version, 1)
+
+        request = make_request(None, method='GET')
+        request.headers['If-None-Match'] = etag
+        response = self.block.handle('get_user_state', request)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(json.loads(response.body)['items'].keys(), ['1'])
+
+    def test_legacy_item_state_upgraded_on_write(self):
+        self.block.item_state = {
+            '0': {'x_percent': '33%', 'y_percent': '11%', 'zone': TOP_ZONE_ID},
+            '1': [100, 250],
+        }
+        self.assertEqual(self.call_handler('get_user_state')['items'], {
+            '0': {'x_percent': '33%', 'y_percent': '11%', 'zone': TOP_ZONE_ID, 'correct_input': True},
+            '1': {'top': 100, 'left': 250, 'zone': MIDDLE_ZONE_ID, 'correct_input': True},
+        })
+
+        data = {"val": 2, "zone": BOTTOM_ZONE_ID, "x_percent": "99%", "y_percent": "95%"}
+        self.call_handler('do_attempt', data)
+        self.assertEqual(self.block.item_state, {'v': 2, 'items': {
+            '0': [TOP_ZONE_ID, '33%', '11%'],
+            '1': {'top': 100, 'left': 250},
+            '2': [BOTTOM_ZONE_ID, '99%', '95%'],
+        }})
+
     def test_studio_submit(self):
         body = {
             'display_name': "Test Drag & Drop",
@@ -104,7 +250,11 @@ class BasicTests(TestCaseMixin, unittest.TestCase):
             'item_text_color': 'coral',
             'weight': '5',
             'data': {
-                'foo': 1
+                'zones': [
+                    {'title': 'Zone 1', 'id': 'zone-1', 'index': 1, 'x': '10', 'y': 20, 'width': 100, 'height': 50},
+                ],
+                'items': [{'id': '0', 'zone': 'Zone 1', 'displayName': 'Item'}],
+                'feedback': {'start': 'Start'},
             },
         }
         res = self.call_handler('studio_submit', body)
@@ -117,13 +267,148 @@ class BasicTests(TestCaseMixin, unittest.TestCase):
         self.assertEqual(self.block.item_background_color, "cornflowerblue")
         self.assertEqual(self.block.item_text_color, "coral")
         self.assertEqual(self.block.weight, 5)
-        self.assertEqual(self.block.data, {'foo': 1})
+        # The size of the (default) background image is probed, and zones converted to percentages:
+        self.assertEqual(self.block.data, {
+            'zones': [{
+                'title': 'Zone 1', 'uid': 'Zone 1', 'x': 10, 'y': 20, 'width': 100, 'height': 50,
+                'x_percent': 10 / 514. * 100, 'y_percent': 20 / 486. * 100,
+                'width_percent': 100 / 514. * 100, 'height_percent': 50 / 486. * 100,
+            }],
+            'items': [{
+                'id': 0, 'zone': 'Zone 1', 'displayName': 'Item', 'feedback': {'correct': '', 'incorrect': ''},
+            }],
+            'feedback': {'start': 'Start', 'finish': ''},
+            'targetImgWidth': 514,
+            'targetImgHeight': 486,
+            'version': 1,
+        })
+
+    def test_percent_geometry_in_configuration(self):
+        self.block.url_name = 'dnd'
+        self.block.data = compile_definition(dict(
+            self.block.data, targetImgWidth=800, targetImgHeight=400,
+            zones=[{'uid': 'a zone', 'title': 'A', 'x': 80, 'y': 40, 'width': 400, 'height': 100}],
+            items=[{'id': 0, 'zone': 'a zone'}],
+        ))
+        self.block.item_state = {'0': {'top': 28, 'left': 315}}
+
+        zones = self.block.get_configuration()['zones']
+        self.assertEqual(zones, [{
+            'uid': 'a zone', 'title': 'A', 'prefixed_uid': 'dnd-a_zone',
+            'x_percent': 10, 'y_percent': 10, 'width_percent': 50, 'height_percent': 25,
+        }])
+        # Legacy learner state is converted when read, and stored converted on the next save:
+        self.assertEqual(self.call_handler('get_user_state', method='GET')['items'], {
+            '0': {'x_percent': 23.75, 'y_percent': 12.5, 'zone': 'a zone', 'correct_input': True},
+        })
+        self.call_handler('reset', {})
+        self.assertEqual(self.block.item_state, {'v': 2, 'items': {}})
+
+    def test_drop_position_validation(self):
+        self.block.data = compile_definition(dict(
+            self.block.data, targetImgWidth=800, targetImgHeight=400,
+            zones=[{'uid': 'a zone', 'title': 'A', 'x': 80, 'y': 40, 'width': 400, 'height': 100}],
+            items=[{'id': 0, 'zone': 'a zone'}],
+        ))
+        far_away = {'val': 0, 'zone': 'a zone', 'x_percent': '90%', 'y_percent': '90%'}
+        # Positions are not validated by default:
+        self.assertTrue(self.call_handler('do_attempt', far_away)['correct'])
+        self.call_handler('reset', {})
+
+        self.block.get_xblock_settings = lambda default: {'validate_drop_position': True}
+        response = self.call_handler('do_attempt', far_away, expect_json=False)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.block.item_state, {'v': 2, 'items': {}})
+        # The item's center may be a little outside of the zone:
+        inside = {'val': 0, 'zone': 'a zone', 'x_percent': '5%', 'y_percent': 40}
+        self.assertTrue(self.call_handler('do_attempt', inside)['correct'])
+
+        self.block.get_xblock_settings = lambda default: {
+            'validate_drop_position': True, 'drop_position_tolerance': 0
+        }
+        self.call_handler('reset', {})
+        self.assertEqual(self.call_handler('do_attempt', inside, expect_json=False).status_code, 400)
+
+    def test_studio_submit_invalid_data(self):
+        data = self.block.data
+        body = {'display_name': "Changed", 'data': {'zones': [], 'items': [{'id': 0, 'zone': 'nowhere'}]}}
+        res = self.call_handler('studio_submit', body)
+        self.assertEqual(res, {'result': 'error', 'message': 'Item 0 belongs to an unknown zone: "nowhere".'})
+        self.assertEqual(self.block.data, data)
+        self.assertNotEqual(self.block.display_name, "Changed")
+
+        # Messages containing non-ASCII author text:
+        body['data'] = {'zones': [{'uid': u'Zon\xe9', 'x': 'wide'}], 'items': []}
+        res = self.call_handler('studio_submit', body)
+        self.assertEqual(res, {'result': 'error', 'message': u'Zone "Zon\xe9" has an invalid x.'})
+        body['data'] = {'zones': [], 'items': [{'id': 0, 'zone': u'\xc9t\xe9'}]}
+        res = self.call_handler('studio_submit', body)
+        self.assertEqual(res, {'result': 'error', 'message': u'Item 0 belongs to an unknown zone: "\xc9t\xe9".'})
+
+        # Messages are translated with the i18n service:
+        i18n = self.block.runtime.service(self.block, 'i18n')
+        with patch.object(i18n, 'ugettext', lambda text: text.replace(u'Item', u'\xc9l\xe9ment')):
+            res = self.call_handler('studio_submit', body)
+        self.assertEqual(res['message'], u'\xc9l\xe9ment 0 belongs to an unknown zone: "\xc9t\xe9".')
+
+    def test_i18n_service_declared(self):
+        # studio_view and the messages of studio_submit are translated with the i18n service, which
+        # runtimes only provide to blocks that declare it:
+        self.assertEqual(DragAndDropBlock.service_declaration('i18n'), 'need')
+        self.assertEqual(DragAndDropBlock.service_declaration('settings'), 'want')
+        self.assertIn('Drag and Drop', self.block.studio_view({}).content)
+
+    def test_publish_event(self):
+        published = []
+        self.block.runtime.publish = lambda _block, event_type, data: published.append((event_type, data))
+
+        res = self.call_handler('publish_event', {'event_type': 'edx.drag_and_drop_v2.loaded'})
+        self.assertEqual(res, {'result': 'success'})
+        res = self.call_handler('publish_event', [
+            {'event_type': 'edx.drag_and_drop_v2.item.picked_up', 'item_id': 0},
+            {'event_type': 'edx.drag_and_drop_v2.feedback.opened', 'content': 'Yes', 'truncated': False},
+        ])
+        self.assertEqual(res, {'result': 'success'})
+        self.assertEqual(published, [
+            ('edx.drag_and_drop_v2.loaded', {}),
+            ('edx.drag_and_drop_v2.item.picked_up', {'item_id': 0}),
+            ('edx.drag_and_drop_v2.feedback.opened', {'content': 'Yes', 'truncated': False}),
+        ])
+
+        # If any event of a batch is invalid, none of them are published:
+        res = self.call_handler('publish_event', [{'event_type': 'edx.drag_and_drop_v2.loaded'}, {'item_id': 0}])
+        self.assertEqual(res, {'result': 'error', 'message': 'Missing event_type in JSON data'})
+        self.assertEqual(len(published), 3)
 
     def test_expand_static_url(self):
         """ Test the expand_static_url handler needed in Studio when changing the image """
         res = self.call_handler('expand_static_url', '/static/blah.png')
         self.assertEqual(res, {'url': '/course/test-course/assets/blah.png'})
 
+    def test_expand_static_urls(self):
+        res = self.call_handler('expand_static_urls', ['/static/blah.png', 'http://example.com/foo.png'])
+        self.assertEqual(res, {'urls': ['/course/test-course/assets/blah.png', 'http://example.com/foo.png']})
+
+    def test_expand_static_url_cached(self):
+        replace_urls = self.apply_patch(
+            'workbench.runtime.WorkbenchRuntime.replace_urls',
+            create=True,
+            return_value='"/course/test-course/assets/cached.png"',
+        )
+        for _ in range(3):
+            res = self.call_handler('expand_static_url', '/static/cached.png')
+            self.assertEqual(res, {'url': '/course/test-course/assets/cached.png'})
+        self.assertEqual(replace_urls.call_count, 1)
+
+        # Saving the problem invalidates the cached URLs of its images:
+        self.call_handler('studio_submit', {
+            'display_name': "Test", 'show_title': True, 'problem_text': "", 'show_problem_header': True,
+            'item_background_color': '', 'item_text_color': '', 'weight': '1',
+            'data': dict(DEFAULT_DATA, targetImg='/static/cached.png'),
+        })
+        self.call_handler('expand_static_url', '/static/cached.png')
+        self.assertEqual(replace_urls.call_count, 2)
+
     def test_image_url(self):
         """ Ensure that the default image and custom URLs are both expanded by the runtime """
         self.assertEqual(self.block.data.get("targetImg"), None)
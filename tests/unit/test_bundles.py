@@ -0,0 +1,119 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import pkg_resources
+
+from drag_and_drop_v2 import bundles
+
+from ..utils import make_block, TestCaseMixin
+
+
+class BuildBundlesTests(unittest.TestCase):
+    """ Tests for building the asset bundles of the views """
+
+    def setUp(self):
+        self.package_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.package_dir)
+        shutil.copytree(
+            pkg_resources.resource_filename('drag_and_drop_v2', 'public'), os.path.join(self.package_dir, 'public')
+        )
+
+    def read(self, path):
+        with open(os.path.join(self.package_dir, path), 'rb') as resource_file:
+            return resource_file.read()
+
+    def test_build(self):
+        manifest = bundles.build(self.package_dir, minify_command='')
+        self.assertEqual(json.loads(self.read(bundles.MANIFEST_PATH)), manifest)
+        self.assertEqual(sorted(manifest), ['student_view', 'studio_view'])
+
+        js = self.read(manifest['student_view']['js'])
+        self.assertRegexpMatches(
+            manifest['student_view']['js'], r'^public/bundles/student_view\.[0-9a-f]{12}\.min\.js$'
+        )
+        for path in bundles.BUNDLES['student_view']['js']:
+            self.assertIn(self.read(path).strip(), js)
+        with gzip.open(os.path.join(self.package_dir, manifest['student_view']['js'] + '.gz')) as gzip_file:
+            self.assertEqual(gzip_file.read(), js)
+
+        # URLs in stylesheets are rewritten relative to the bundle directory:
+        css = self.read(manifest['studio_view']['css'])
+        self.assertIn('url("../css/vendor/images/ui-icons_222222_256x240.png")', css)
+        self.assertNotIn('url("images/', css)
+
+    def test_rebuild(self):
+        manifest = bundles.build(self.package_dir, minify_command='')
+        self.assertEqual(bundles.build(self.package_dir, minify_command=''), manifest)
+
+        with open(os.path.join(self.package_dir, 'public/js/drag_and_drop.js'), 'a') as js_file:
+            js_file.write('\n// Changed\n')
+        new_manifest = bundles.build(self.package_dir, minify_command='')
+        self.assertNotEqual(new_manifest['student_view']['js'], manifest['student_view']['js'])
+        self.assertEqual(new_manifest['studio_view'], manifest['studio_view'])
+        # Bundles of previous builds are removed:
+        self.assertEqual(len(os.listdir(os.path.join(self.package_dir, bundles.BUNDLE_DIR))), 9)
+
+    def load_manifest(self):
+        """ Loads the manifest from the package directory, as the views do """
+        resources = mock.Mock()
+        resources.resource_exists.side_effect = lambda _, path: os.path.exists(os.path.join(self.package_dir, path))
+        resources.resource_string.side_effect = lambda _, path: self.read(path)
+        resources.resource_filename.side_effect = lambda _, path: os.path.join(self.package_dir, path)
+        with mock.patch('drag_and_drop_v2.bundles.pkg_resources', resources):
+            with mock.patch('drag_and_drop_v2.bundles._manifest', []):
+                return bundles.get_manifest()
+
+    def test_stale_manifest_ignored(self):
+        self.assertIsNone(self.load_manifest())
+        manifest = bundles.build(self.package_dir, minify_command='')
+        self.assertEqual(self.load_manifest(), manifest)
+
+        # Once a bundled file is edited, the views load the individual files until the bundles are rebuilt:
+        manifest_mtime = os.path.getmtime(os.path.join(self.package_dir, bundles.MANIFEST_PATH))
+        os.utime(os.path.join(self.package_dir, 'public/js/drag_and_drop.js'), (manifest_mtime + 1, manifest_mtime + 1))
+        with mock.patch('drag_and_drop_v2.bundles.log') as log:
+            self.assertIsNone(self.load_manifest())
+        self.assertEqual(log.warning.call_args[0][1], 'public/js/drag_and_drop.js')
+
+    def test_minify_css(self):
+        css = u'/* Comment */\n.a > .b,\n.c {\n    content: "  /* kept */ ";\n    color: red;\n}\n'
+        self.assertEqual(bundles.minify_css(css), u'.a>.b,.c{content: "  /* kept */ ";color: red}')
+
+
+class ViewResourcesTests(TestCaseMixin, unittest.TestCase):
+    """ Tests for the resources added to the fragments of the views """
+
+    def setUp(self):
+        self.patch_workbench()
+        self.block = make_block()
+
+    def set_manifest(self, manifest):
+        self.apply_patch('drag_and_drop_v2.bundles._manifest', [manifest])
+
+    def test_individual_files_without_bundles(self):
+        self.set_manifest(None)
+        fragment = self.block.student_view({})
+        urls = [resource.data for resource in fragment.resources if resource.kind == 'url']
+        self.assertIn('/expanded/url/to/drag_and_drop_v2/public/js/drag_and_drop.js', urls)
+        self.assertEqual(len(urls), 3)
+
+    def test_bundles(self):
+        self.set_manifest({
+            'student_view': {
+                'css': 'public/bundles/student_view.1.min.css', 'js': 'public/bundles/student_view.2.min.js'
+            },
+            'studio_view': {
+                'css': 'public/bundles/studio_view.3.min.css', 'js': 'public/bundles/studio_view.4.min.js'
+            },
+        })
+        for view, expected in (('student_view', ['1.min.css', '2.min.js']), ('studio_view', ['3.min.css', '4.min.js'])):
+            fragment = getattr(self.block, view)({})
+            urls = [resource.data for resource in fragment.resources if resource.kind == 'url']
+            self.assertEqual(urls, [
+                '/expanded/url/to/drag_and_drop_v2/public/bundles/{}.{}'.format(view, suffix) for suffix in expected
+            ])
@@ -0,0 +1,101 @@
+import struct
+import unittest
+
+import pkg_resources
+
+from drag_and_drop_v2.images import get_default_image_size, probe_image_size
+
+from ..utils import make_block, TestCaseMixin
+
+
+class ImageSizeTests(unittest.TestCase):
+    """ Tests for the probing of background image dimensions """
+
+    def test_png(self):
+        data = pkg_resources.resource_string('drag_and_drop_v2', 'public/img/triangle.png')
+        self.assertEqual(probe_image_size(data), (514, 486))
+        self.assertEqual(get_default_image_size(), (514, 486))
+
+    def test_gif(self):
+        self.assertEqual(probe_image_size(b'GIF89a' + struct.pack('<HH', 320, 200) + b'\x00' * 8), (320, 200))
+
+    def test_jpeg(self):
+        app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+        sof0 = b'\xff\xc0' + struct.pack('>HBHH', 17, 8, 480, 640) + b'\x00' * 10
+        self.assertEqual(probe_image_size(b'\xff\xd8' + app0 + sof0), (640, 480))
+        self.assertIsNone(probe_image_size(b'\xff\xd8' + app0))
+
+    def test_svg(self):
+        self.assertEqual(
+            probe_image_size(b'<svg xmlns="http://www.w3.org/2000/svg" width="300px" height="150"></svg>'),
+            (300, 150)
+        )
+        self.assertEqual(
+            probe_image_size(b'<?xml version="1.0"?><svg width="100%" viewBox="0 0 40 30"></svg>'),
+            (40, 30)
+        )
+        self.assertIsNone(probe_image_size(b'<svg width="100%" height="100%"></svg>'))
+        self.assertIsNone(probe_image_size(b'<svg unclosed'))
+
+    def test_svg_entities_not_expanded(self):
+        laughs = b'<!DOCTYPE svg [<!ENTITY a "aaaaaaaaaa">' + b''.join(
+            '<!ENTITY {0} "&{1};&{1};&{1};&{1};&{1};&{1};&{1};&{1};&{1};&{1};">'.format(
+                chr(ord('b') + index), chr(ord('a') + index)
+            ).encode('ascii') for index in range(8)
+        ) + b']>'
+        self.assertIsNone(probe_image_size(laughs + b'<svg width="&i;" height="10"></svg>'))
+        external = b'<!DOCTYPE svg [<!ENTITY w SYSTEM "file:///etc/passwd">]>'
+        self.assertIsNone(probe_image_size(external + b'<svg width="&w;" height="10">&w;</svg>'))
+        self.assertEqual(probe_image_size(external + b"<svg height='10' width='20'>&w;</svg>"), (20, 10))
+
+    def test_unknown(self):
+        self.assertIsNone(probe_image_size(b''))
+        self.assertIsNone(probe_image_size(b'not an image'))
+        self.assertIsNone(probe_image_size(b'\x89PNG\r\n\x1a\n' + b'\x00' * 4 + b'IHDR' + b'\x00' * 8))
+
+
+class StudioSubmitImageSizeTests(TestCaseMixin, unittest.TestCase):
+    """ Tests for the image dimensions stored with the problem definition """
+
+    def setUp(self):
+        self.patch_workbench()
+        self.block = make_block()
+
+    def submit(self, data):
+        body = {
+            'display_name': "Test Drag & Drop",
+            'show_title': True,
+            'problem_text': "Problem Drag & Drop",
+            'show_problem_header': True,
+            'item_background_color': '',
+            'item_text_color': '',
+            'weight': 1,
+            'data': data,
+        }
+        self.assertEqual(self.call_handler('studio_submit', body), {'result': 'success'})
+
+    def test_measured_size_kept_when_asset_unreadable(self):
+        # Outside of edx-platform course assets cannot be read; the size measured by the editor is used.
+        self.submit({
+            'zones': [{'title': 'Zone 1', 'x': 40, 'y': 30, 'width': 400, 'height': 300}],
+            'items': [],
+            'feedback': {'start': 'Start', 'finish': 'Finish'},
+            'targetImg': '/static/image.png',
+            'targetImgWidth': 800,
+            'targetImgHeight': 600,
+        })
+        zone = self.block.data['zones'][0]
+        self.assertEqual((zone['x_percent'], zone['width_percent']), (5, 50))
+        self.assertEqual(self.block.get_configuration()['target_img_width'], 800)
+
+    def test_unknown_size(self):
+        self.submit({
+            'zones': [{'title': 'Zone 1', 'x': 40, 'y': 30, 'width': 400, 'height': 300}],
+            'items': [],
+            'feedback': {'start': 'Start', 'finish': 'Finish'},
+            'targetImg': 'http://example.com/image.png',
+        })
+        self.assertNotIn('x_percent', self.block.data['zones'][0])
+        configuration = self.block.get_configuration()
+        self.assertIsNone(configuration['target_img_width'])
+        self.assertIsNone(configuration['target_img_height'])
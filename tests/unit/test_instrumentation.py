@@ -0,0 +1,99 @@
+import json
+import logging
+import unittest
+
+from mock import Mock
+from xblock.fragment import Fragment
+
+from drag_and_drop_v2.default_data import TOP_ZONE_ID
+from drag_and_drop_v2.instrumentation import get_sink, instrumented, LoggingSink, NullSink
+
+from ..utils import make_block, TestCaseMixin
+
+
+class InstrumentationTests(TestCaseMixin, unittest.TestCase):
+    """ Tests for the optional instrumentation of views and handlers """
+
+    def setUp(self):
+        self.patch_workbench()
+        self.block = make_block()
+        self.sink = get_sink('histogram')
+        self.sink.clear()
+
+    def enable(self, setting='histogram'):
+        self.block.get_xblock_settings = lambda default: {'instrumentation': setting}
+
+    def test_disabled_by_default(self):
+        self.call_handler('do_attempt', {"val": 0, "zone": TOP_ZONE_ID, "x_percent": "1%", "y_percent": "1%"})
+        self.assertEqual(self.sink.values('do_attempt', 'wall_time'), [])
+
+    def test_handler_metrics(self):
+        self.enable()
+        data = {"val": 0, "zone": TOP_ZONE_ID, "x_percent": "1%", "y_percent": "1%"}
+        response = self.call_handler('do_attempt', data, expect_json=False)
+
+        self.assertEqual(len(self.sink.values('do_attempt', 'wall_time')), 1)
+        self.assertEqual(self.sink.values('do_attempt', 'request_bytes'), [len(json.dumps(data))])
+        self.assertEqual(self.sink.values('do_attempt', 'response_bytes'), [len(response.body)])
+        # item_state, progress, state_version and last_published_grade are saved:
+        self.assertEqual(self.sink.values('do_attempt', 'field_writes'), [4])
+        self.assertGreater(self.sink.values('do_attempt', 'field_reads')[0], 0)
+
+        self.call_handler('get_user_state', method='GET')
+        self.assertEqual(self.sink.values('get_user_state', 'field_writes'), [0])
+        self.assertEqual(self.sink.histogram('get_user_state', 'field_writes', [0, 1]), [1, 0, 0])
+
+    def test_failed_calls_recorded(self):
+        self.enable()
+        response = self.call_handler('do_attempt', {"val": 0, "zone": "no such zone"}, expect_json=False)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.sink.values('do_attempt', 'error'), [True])
+
+        self.block._get_problem = Mock(side_effect=ValueError)  # pylint: disable=protected-access
+        with self.assertRaises(ValueError):
+            self.call_handler('get_user_state')
+        self.assertEqual(self.sink.values('get_user_state', 'error'), [True])
+        self.assertEqual(len(self.sink.values('get_user_state', 'wall_time')), 1)
+
+    def test_without_runtime_internals(self):
+        class Block(object):
+            """ A block of an XBlock version without the field caches used for the field counts """
+            get_xblock_settings = staticmethod(lambda default: {'instrumentation': 'histogram'})
+
+            @instrumented('view')
+            def view(self, context):  # pylint: disable=no-self-use
+                return Fragment(u'content')
+
+        Block().view({})
+        self.assertEqual(self.sink.values('view', 'field_reads'), [])
+        self.assertEqual(self.sink.values('view', 'field_writes'), [])
+        self.assertEqual(self.sink.values('view', 'response_bytes'), [len(u'content') + len('{}')])
+        self.assertEqual(self.sink.values('view', 'error'), [False])
+
+    def test_view_metrics(self):
+        self.enable()
+        fragment = self.block.student_view({})
+        self.assertGreater(self.sink.values('student_view', 'response_bytes')[0], len(fragment.content))
+        self.assertEqual(self.sink.values('student_view', 'request_bytes'), [])
+
+    def test_sinks(self):
+        self.assertIsInstance(get_sink('null'), NullSink)
+        self.assertIsInstance(get_sink('logging'), LoggingSink)
+        self.assertIs(get_sink('drag_and_drop_v2.instrumentation.HistogramSink'), get_sink(
+            'drag_and_drop_v2.instrumentation.HistogramSink'
+        ))
+        self.assertIsNone(get_sink(None))
+
+        logger = Mock()
+        LoggingSink(logger).record('reset', {'wall_time': 0.5, 'field_writes': 2})
+        logger.log.assert_called_once_with(
+            logging.INFO, "drag-and-drop-v2 %s: %s", 'reset', "field_writes=2, wall_time=0.5"
+        )
+
+    def test_sink_errors_ignored(self):
+        self.enable('drag_and_drop_v2.instrumentation.HistogramSink')
+        sink = get_sink('drag_and_drop_v2.instrumentation.HistogramSink')
+        sink.record = Mock(side_effect=ValueError)
+        self.addCleanup(delattr, sink, 'record')
+        self.assertEqual(self.call_handler('reset', {})['items'], {})
+        self.assertTrue(sink.record.called)
@@ -0,0 +1,161 @@
+import copy
+import unittest
+
+from drag_and_drop_v2.default_data import DEFAULT_DATA, TOP_ZONE_ID, TOP_ZONE_TITLE
+from drag_and_drop_v2.problem import (
+    compile_definition, CompiledProblem, fingerprint, get_compiled_problem, InvalidProblemDefinition, ZoneGrid
+)
+
+
+class CompiledProblemTests(unittest.TestCase):
+    """ Tests for the compiled, read-only index over a problem definition """
+
+    def test_lookups(self):
+        problem = CompiledProblem(DEFAULT_DATA)
+        self.assertEqual(problem.get_item(1)['displayName'], "Goes to the middle")
+        self.assertRaises(KeyError, problem.get_item, 42)
+        self.assertEqual(problem.get_zone(TOP_ZONE_ID)['title'], TOP_ZONE_TITLE)
+        self.assertIsNone(problem.get_zone('none'))
+        self.assertEqual(problem.graded_item_ids, frozenset(['0', '1', '2']))
+        self.assertEqual(problem.input_item_ids, frozenset())
+
+    def test_legacy_zones_normalized(self):
+        data = {
+            'zones': [{'title': 'Zone 1', 'id': 'zone-1', 'index': 1, 'x': 0, 'y': 0}],
+            'items': [{'id': 0, 'zone': 'Zone 1', 'inputOptions': {'value': 1, 'margin': 0}}],
+        }
+        problem = CompiledProblem(data)
+        self.assertEqual(problem.zones, [{'title': 'Zone 1', 'uid': 'Zone 1', 'x': 0, 'y': 0}])
+        self.assertEqual(problem.input_item_ids, frozenset(['0']))
+        # The source data is left untouched:
+        self.assertIn('id', data['zones'][0])
+
+    def test_compiled_once_per_content_version(self):
+        data = copy.deepcopy(DEFAULT_DATA)
+        problem = get_compiled_problem(data)
+        self.assertIs(get_compiled_problem(copy.deepcopy(data)), problem)
+
+        data['items'].pop()
+        changed = get_compiled_problem(data)
+        self.assertIsNot(changed, problem)
+        self.assertEqual(changed.fingerprint, fingerprint(data))
+        self.assertRaises(KeyError, changed.get_item, 3)
+
+
+class CompileDefinitionTests(unittest.TestCase):
+    """ Tests for the validation and normalization of problem definitions at save time """
+
+    def test_default_data(self):
+        data = compile_definition(DEFAULT_DATA)
+        self.assertEqual(data['version'], 1)
+        self.assertEqual(data['zones'], DEFAULT_DATA['zones'])
+        self.assertEqual(data['items'], DEFAULT_DATA['items'])
+        self.assertEqual(CompiledProblem(data).zones, CompiledProblem(DEFAULT_DATA).zones)
+
+    def test_legacy_data_upgraded(self):
+        data = compile_definition({
+            'zones': [{'title': 'A', 'id': 'zone-1', 'x': '5'}, {'x': 0}, {'uid': 'zone-1', 'title': 'C'}],
+            'items': [
+                {'id': 0, 'zone': 'A', 'inputOptions': {'value': '2.5'}},
+                {'id': '1', 'zone': 'C', 'feedback': {'correct': 'Yes'}},
+                {'id': 2},
+            ],
+        })
+        self.assertEqual([zone['uid'] for zone in data['zones']], ['A', 'zone-2', 'zone-1'])
+        self.assertEqual(data['zones'][0]['x'], 5)
+        self.assertEqual([(item['id'], item['zone']) for item in data['items']], [(0, 'A'), (1, 'zone-1'), (2, 'none')])
+        self.assertEqual(data['items'][0]['inputOptions'], {'value': 2.5, 'margin': 0})
+        self.assertEqual(data['items'][1]['feedback'], {'correct': 'Yes', 'incorrect': ''})
+        self.assertEqual(data['feedback'], {'start': '', 'finish': ''})
+
+    def test_percent_geometry(self):
+        data = compile_definition({
+            'zones': [{'uid': 'z', 'x': 100, 'y': '50', 'width': 200, 'height': 25}],
+            'items': [
+                {'id': 0, 'zone': 'z', 'size': {'width': '80px', 'height': 'auto'}},
+                {'id': 1, 'zone': 'z', 'size': {'width': 'auto'}},
+            ],
+            'targetImgWidth': 400,
+            'targetImgHeight': 200,
+        })
+        self.assertEqual(data['zones'][0], {
+            'uid': 'z', 'x': 100, 'y': 50, 'width': 200, 'height': 25,
+            'x_percent': 25, 'y_percent': 25, 'width_percent': 50, 'height_percent': 12.5,
+        })
+        self.assertEqual(data['items'][0]['widthPercent'], 20)
+        self.assertNotIn('widthPercent', data['items'][1])
+
+        # Without a valid image size, nothing is converted:
+        data = compile_definition(dict(data, targetImgWidth=0, zones=[{'uid': 'z', 'x': 1, 'y': 1}]))
+        self.assertNotIn('x_percent', data['zones'][0])
+        self.assertNotIn('targetImgWidth', data)
+
+    def test_migrate_item_state(self):
+        problem = CompiledProblem({
+            'zones': [], 'items': [{'id': 0, 'zone': 'none', 'size': {'width': '100px', 'height': 'auto'}}],
+            'targetImgWidth': 400, 'targetImgHeight': 200,
+        })
+        item_state = {
+            '0': {'top': '56px', 'left': 270, 'absolute': True},
+            '1': {'top': 0, 'left': 220},
+            '2': {'zone': 'z', 'x_percent': 5, 'y_percent': 6},
+        }
+        problem.migrate_item_state(item_state)
+        self.assertEqual(item_state, {
+            '0': {'x_percent': 25, 'y_percent': 39},
+            '1': {'x_percent': 23.75, 'y_percent': 11},
+            '2': {'zone': 'z', 'x_percent': 5, 'y_percent': 6},
+        })
+
+        legacy = {'0': {'top': 0, 'left': 220}}
+        CompiledProblem(DEFAULT_DATA).migrate_item_state(legacy)
+        self.assertEqual(legacy, {'0': {'top': 0, 'left': 220}})
+
+    def test_invalid(self):
+        zone = {'uid': 'z', 'title': 'Z'}
+        for data in [
+                None,
+                {'zones': []},
+                {'zones': [zone, zone], 'items': []},
+                {'zones': [zone], 'items': [{'zone': 'z'}]},
+                {'zones': [zone], 'items': [{'id': 0, 'zone': 'z'}, {'id': 0, 'zone': 'z'}]},
+                {'zones': [zone], 'items': [{'id': 0, 'zone': 'elsewhere'}]},
+                {'zones': [zone], 'items': [{'id': 0, 'zone': 'z', 'inputOptions': {'value': 'x'}}]},
+                {'zones': [dict(zone, width='wide')], 'items': []},
+        ]:
+            self.assertRaises(InvalidProblemDefinition, compile_definition, data)
+
+
+class ZoneGridTests(unittest.TestCase):
+    """ Tests for the spatial index over zones """
+
+    def test_zones_at(self):
+        zones = [
+            {'uid': 'z{}'.format(index), 'x_percent': index % 10 * 10, 'y_percent': index // 10 * 10,
+             'width_percent': 10, 'height_percent': 10}
+            for index in range(100)
+        ]
+        zones.append({'uid': 'all', 'x_percent': 0, 'y_percent': 0, 'width_percent': 100, 'height_percent': 100})
+        zones.append({'uid': 'pixels', 'x': 0, 'y': 0, 'width': 10, 'height': 10})
+        grid = ZoneGrid(zones)
+
+        self.assertEqual(grid.size, 11)
+        self.assertEqual(grid.zones_at(55, 5), ['z5', 'all'])
+        self.assertEqual(grid.zones_at(50, 50), ['z44', 'z45', 'z54', 'z55', 'all'])
+        self.assertEqual(grid.zones_at(100, 100), ['z99', 'all'])
+        self.assertEqual(grid.zones_at(-1, 50), [])
+        # Each zone is tested against the same points as a linear search would find:
+        for x_percent, y_percent in [(0, 0), (12.5, 97), (33.3, 66.6), (99.9, 0.1)]:
+            self.assertEqual(grid.zones_at(x_percent, y_percent), [
+                zone['uid'] for zone in zones if grid.contains(zone['uid'], x_percent, y_percent)
+            ])
+
+    def test_contains(self):
+        grid = CompiledProblem(compile_definition({
+            'zones': [{'uid': 'z', 'x': 100, 'y': 50, 'width': 200, 'height': 25}], 'items': [],
+            'targetImgWidth': 400, 'targetImgHeight': 200,
+        })).zone_grid
+        self.assertTrue(grid.contains('z', 50, 30))
+        self.assertFalse(grid.contains('z', 80, 30))
+        self.assertTrue(grid.contains('z', 80, 30, margin=5))
+        self.assertIsNone(grid.contains('elsewhere', 50, 30))
@@ -0,0 +1,77 @@
+import copy
+import unittest
+
+from drag_and_drop_v2.default_data import TOP_ZONE_ID, MIDDLE_ZONE_ID, BOTTOM_ZONE_ID
+from drag_and_drop_v2.rescoring import rescore
+
+from ..utils import make_block, TestCaseMixin
+
+
+class RescoringTests(TestCaseMixin, unittest.TestCase):
+    """ Tests for offline bulk rescoring """
+
+    def setUp(self):
+        self.block = make_block()
+        self.block.weight = 2
+
+    def drop(self, item_id, zone):
+        self.call_handler('do_attempt', {"val": item_id, "zone": zone, "x_percent": "10%", "y_percent": "10%"})
+
+    def test_same_grade_as_block(self):
+        records = []
+        for user, drops in enumerate([[], [(0, TOP_ZONE_ID)], [(0, TOP_ZONE_ID), (1, BOTTOM_ZONE_ID)]]):
+            self.call_handler('reset', {})
+            for item_id, zone in drops:
+                self.drop(item_id, zone)
+            records.append((user, copy.deepcopy(self.block.item_state)))
+            expected = (user, self.block._get_grade(), self.block._is_finished())  # pylint: disable=protected-access
+            result = list(rescore(self.block.data, [records[-1]], weight=2, processes=1))
+            self.assertEqual(result, [expected])
+
+        # A process pool gives the same results, in the same order:
+        self.assertEqual(
+            list(rescore(self.block.data, records, weight=2, processes=2, chunksize=1)),
+            list(rescore(self.block.data, records, weight=2, processes=1)),
+        )
+
+    def test_records_read_in_bounded_batches(self):
+        consumed = []
+
+        def records():
+            for user in xrange(1000):
+                consumed.append(user)
+                yield user, {}
+
+        results = rescore(self.block.data, records(), processes=2, chunksize=3)
+        self.assertEqual(next(results), (0, 0, False))
+        # At most two chunks per process are read ahead of the results:
+        self.assertLessEqual(len(consumed), 2 * 2 * 3)
+        self.assertEqual(len(list(results)), 999)
+
+    def test_rescore_after_fix(self):
+        self.drop(0, TOP_ZONE_ID)
+        self.drop(1, BOTTOM_ZONE_ID)
+        self.drop(2, BOTTOM_ZONE_ID)
+        records = [('learner', self.block.item_state)]
+        self.assertEqual(list(rescore(self.block.data, records, weight=2, processes=1)), [('learner', 4 / 3., False)])
+
+        # The author decides item 1 should have been a decoy:
+        data = copy.deepcopy(self.block.data)
+        data['items'][1]['zone'] = 'none'
+        self.assertEqual(list(rescore(data, records, weight=2, processes=1)), [('learner', 2, True)])
+
+    def test_rescore_after_zone_fix(self):
+        self.drop(0, TOP_ZONE_ID)
+        self.drop(1, MIDDLE_ZONE_ID)
+        self.drop(2, BOTTOM_ZONE_ID)
+        records = [('learner', self.block.item_state)]
+        self.assertEqual(list(rescore(self.block.data, records, weight=2, processes=1)), [('learner', 2, True)])
+
+        # The author moves item 0's correct zone; the learner's placement is no longer correct:
+        data = copy.deepcopy(self.block.data)
+        data['items'][0]['zone'] = MIDDLE_ZONE_ID
+        self.assertEqual(list(rescore(data, records, weight=2, processes=1)), [('learner', 4 / 3., False)])
+
+    def test_legacy_item_state(self):
+        records = [('learner', {'0': {'top': 10, 'left': 20}, '1': [5, 5]})]
+        self.assertEqual(list(rescore(self.block.data, records, processes=1)), [('learner', 2 / 3., False)])